@@ -0,0 +1,172 @@
+"""
+Script actualizar_datos.py - Actualización incremental de la capa de predios.
+
+Compara una nueva versión del shapefile de predios publicada por Catastro con la
+versión instalada (por CHIP y huella de geometría), recalcula la afectación solo
+de los predios nuevos, eliminados o modificados, instala la nueva capa y deja
+listas las cachés de la nueva versión de datos. Si la aplicación usa capas limpias
+(ver validar_datos.py), la nueva capa se valida y repara antes de compararla.
+
+Uso:
+    python actualizar_datos.py NUEVO_PREDIOS.shp [--simular]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+import datos
+import estadisticas
+import validar_datos
+
+
+def huellas_geometria(predios):
+    """
+    Devuelve una Serie indexada por CHIP con la huella SHA-1 de la geometría
+    normalizada de cada predio. Si un CHIP tiene varios polígonos se combinan.
+    """
+    huellas = pd.Series(datos.huellas_geometrias(predios.geometry.values), index=predios["CHIP"].values)
+    return huellas.groupby(level=0).agg(datos.combinar_huellas)
+
+
+def _ruta_manifiesto(huella):
+    return datos.ruta_cache(f"manifiesto_predios_{huella}.csv")
+
+
+def leer_manifiesto(huella):
+    """
+    Devuelve las huellas de geometría guardadas para una versión de los datos,
+    o las calcula leyendo la capa instalada si no existen.
+    """
+    ruta = _ruta_manifiesto(huella)
+    if os.path.exists(ruta):
+        return pd.read_csv(ruta, index_col="CHIP")["HUELLA"]
+
+    predios = gpd.read_file(datos.RUTA_PREDIOS).to_crs(epsg=datos.EPSG_TRABAJO)
+    return huellas_geometria(predios)
+
+
+def guardar_manifiesto(huellas, huella):
+    ruta = _ruta_manifiesto(huella)
+    huellas.rename("HUELLA").to_csv(ruta + ".tmp", index_label="CHIP")
+    os.replace(ruta + ".tmp", ruta)
+
+
+def comparar(huellas_anteriores, huellas_nuevas):
+    """
+    Clasifica los CHIP en agregados, eliminados y modificados.
+    """
+    anteriores = set(huellas_anteriores.index)
+    nuevos = set(huellas_nuevas.index)
+    comunes = sorted(anteriores & nuevos)
+
+    modificados = huellas_anteriores.loc[comunes] != huellas_nuevas.loc[comunes]
+    return {
+        "agregados": sorted(nuevos - anteriores),
+        "eliminados": sorted(anteriores - nuevos),
+        "modificados": sorted(modificados[modificados].index),
+    }
+
+
+def actualizar_tabla(tabla_anterior, predios_nuevos, zonas, cambios):
+    """
+    Recalcula la tabla de afectación solo para los predios que cambiaron.
+    """
+    por_recalcular = set(cambios["agregados"]) | set(cambios["modificados"])
+    por_quitar = set(cambios["eliminados"]) | set(cambios["modificados"])
+
+    tabla = tabla_anterior.drop(index=list(por_quitar), errors="ignore")
+    subconjunto = predios_nuevos[predios_nuevos["CHIP"].isin(por_recalcular)]
+
+    if len(subconjunto) > 0:
+        recalculada = estadisticas.tabla_afectacion(subconjunto, zonas)
+        tabla = pd.concat([tabla, recalculada]).fillna(0.0)
+
+    return estadisticas.completar_totales(tabla)
+
+
+def instalar_capa(ruta_nueva, huella_anterior):
+    """
+    Respalda la capa original de predios en cache/respaldo_<huella> y copia
+    la nueva en su lugar, con el nombre que espera la aplicación. Los índices
+    auxiliares (.sbn, .sbx, ...) de la capa anterior también se retiran: GDAL los
+    usaría con la geometría nueva.
+    """
+    respaldo = datos.ruta_cache(f"respaldo_{huella_anterior}")
+    os.makedirs(respaldo, exist_ok=True)
+    for ruta in (datos.componentes_shapefile(datos.RUTA_PREDIOS_ORIGINAL)
+                 + datos.auxiliares_shapefile(datos.RUTA_PREDIOS_ORIGINAL)):
+        shutil.move(ruta, os.path.join(respaldo, os.path.basename(ruta)))
+
+    destino, _ = os.path.splitext(datos.RUTA_PREDIOS_ORIGINAL)
+    for ruta in datos.componentes_shapefile(ruta_nueva):
+        shutil.copy2(ruta, destino + os.path.splitext(ruta)[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza de forma incremental la capa de predios de Geolandy.")
+    parser.add_argument("nuevo", help="Ruta al nuevo shapefile de predios (.shp)")
+    parser.add_argument("--simular", action="store_true",
+                        help="Solo muestra el resumen de cambios, sin instalar la capa ni escribir cachés")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    huella_anterior = datos.huella_datos()
+
+    predios_nuevos = gpd.read_file(args.nuevo).to_crs(epsg=datos.EPSG_TRABAJO)
+    usa_limpios = datos.RUTA_PREDIOS != datos.RUTA_PREDIOS_ORIGINAL
+    if usa_limpios:
+        predios_nuevos, informe = validar_datos.validar_y_reparar(
+            predios_nuevos[datos.COLUMNAS_PREDIOS + ["geometry"]], os.path.basename(args.nuevo), "CHIP")
+        print(f"Validación: {informe['geometrias_invalidas']} inválidas reparadas | "
+              f"{informe['registros_eliminados']} registros sin geometría eliminados")
+    huellas_nuevas = huellas_geometria(predios_nuevos)
+    cambios = comparar(leer_manifiesto(huella_anterior), huellas_nuevas)
+
+    resumen_cambios = {
+        "version_anterior": huella_anterior,
+        "agregados": len(cambios["agregados"]),
+        "eliminados": len(cambios["eliminados"]),
+        "modificados": len(cambios["modificados"]),
+        "sin_cambios": len(huellas_nuevas) - len(cambios["agregados"]) - len(cambios["modificados"]),
+    }
+    print(f"Agregados: {resumen_cambios['agregados']} | Eliminados: {resumen_cambios['eliminados']} | "
+          f"Modificados: {resumen_cambios['modificados']} | Sin cambios: {resumen_cambios['sin_cambios']}")
+
+    if args.simular:
+        return 0
+
+    zonas = gpd.read_file(datos.RUTA_ZONAS).to_crs(epsg=datos.EPSG_TRABAJO)
+    tabla_anterior = estadisticas.leer_tabla(huella_anterior)
+    if tabla_anterior is None:
+        print("No hay tabla de afectación para la versión anterior; se calcula completa.")
+        tabla = estadisticas.tabla_afectacion(predios_nuevos, zonas)
+    else:
+        tabla = actualizar_tabla(tabla_anterior, predios_nuevos, zonas, cambios)
+
+    instalar_capa(args.nuevo, huella_anterior)
+    if usa_limpios:
+        validar_datos.escribir_capa(predios_nuevos, datos.RUTA_PREDIOS)
+    huella_nueva = datos.huella_datos()
+
+    guardar_manifiesto(huellas_nuevas, huella_nueva)
+    estadisticas.guardar(tabla, estadisticas.resumir(tabla), huella_nueva)
+
+    resumen_cambios.update(version_nueva=huella_nueva, chips=cambios,
+                           segundos=round(time.perf_counter() - inicio, 2))
+    ruta_resumen = datos.ruta_cache(f"cambios_{huella_nueva}.json")
+    with open(ruta_resumen, "w", encoding="utf-8") as f:
+        json.dump(resumen_cambios, f, ensure_ascii=False, indent=2)
+
+    print(f"Versión {huella_anterior} -> {huella_nueva} en {resumen_cambios['segundos']} s. Resumen: {ruta_resumen}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Módulo almacen_compartido.py - Capas geoespaciales compartidas entre procesos.
+
+El primer worker de Streamlit que arranca publica las capas ya reproyectadas
+(coordenadas en arreglos planos + columnas de atributos) como archivos .npy en un
+directorio por versión de datos. Los demás workers los abren con np.load(mmap_mode="r"),
+de modo que no hay que volver a leer los shapefiles, reproyectar ni unir las zonas.
+
+Los atributos quedan mapeados sin copiarse: los números y los códigos de las
+categorías son los arreglos del archivo, y los textos son columnas Arrow sobre un
+búfer UTF-8 y sus desplazamientos (sin pyarrow los textos sí se copian). Sus páginas
+las comparten todos los workers a través de la caché de páginas del sistema. La
+geometría, en cambio, no se puede compartir: cada worker construye sus objetos GEOS
+(shapely.from_ragged_array copia las coordenadas) y su índice espacial, que son la
+mayor parte de la memoria de una capa. `python almacen_compartido.py --medir` reporta
+el tiempo y la memoria residente que agrega un worker en cada caso.
+
+Al publicar una versión se eliminan los almacenes anteriores a la versión previa; la
+previa se conserva porque puede haber workers adjuntándola en ese momento. Si un
+almacén desaparece mientras se adjunta, el worker lee los shapefiles.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+import datos
+
+DIRECTORIO_ALMACEN = os.environ.get("GEOLANDY_ALMACEN_DIR", datos.DIRECTORIO_CACHE)
+ALMACEN_ACTIVO = os.environ.get("GEOLANDY_ALMACEN", "1") != "0"
+
+CAPAS = ("predios", "zonas", "reserva")
+
+
+def _directorio(huella):
+    return os.path.join(DIRECTORIO_ALMACEN, f"almacen_{huella}")
+
+
+def _guardar_capa(gdf, nombre, destino):
+    """
+    Escribe la geometría de una capa como arreglos de coordenadas (formato ragged de
+    shapely) y cada columna de atributos como un .npy. Devuelve su descripción.
+    """
+    tipo, coordenadas, desplazamientos = shapely.to_ragged_array(gdf.geometry.values)
+    np.save(os.path.join(destino, f"{nombre}_coords.npy"), coordenadas)
+    for i, arreglo in enumerate(desplazamientos):
+        np.save(os.path.join(destino, f"{nombre}_desplazamientos_{i}.npy"), arreglo)
+
+    columnas = []
+    for columna in gdf.columns.drop(gdf.geometry.name):
+        serie = gdf[columna]
+        base = os.path.join(destino, f"{nombre}_{columna}")
+
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            np.save(base + "_codigos.npy", serie.cat.codes.to_numpy())
+            columnas.append({"nombre": columna, "tipo": "categoria",
+                             "categorias": serie.cat.categories.tolist()})
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            # Formato de las columnas de texto de Arrow: búfer UTF-8, desplazamientos y validez
+            nulos = serie.isna().to_numpy()
+            codificados = [t.encode("utf-8") for t in serie.astype(object).where(~nulos, "").astype(str)]
+            np.save(base + "_utf8.npy", np.frombuffer(b"".join(codificados), dtype=np.uint8))
+            np.save(base + "_inicios.npy", np.cumsum([0] + [len(t) for t in codificados], dtype=np.int64))
+            np.save(base + "_validos.npy", np.packbits(~nulos, bitorder="little"))
+            columnas.append({"nombre": columna, "tipo": "texto"})
+        else:
+            np.save(base + ".npy", serie.to_numpy())
+            columnas.append({"nombre": columna, "tipo": "numero"})
+
+    return {"tipo_geometria": int(tipo), "niveles": len(desplazamientos),
+            "crs": gdf.crs.to_wkt(), "columnas": columnas}
+
+
+def _texto_mapeado(utf8, inicios, validos):
+    """
+    Columna de texto sobre los búferes mapeados. Con pyarrow no se copia: es un arreglo
+    Arrow que apunta al archivo. Sin pyarrow se crea un str (internado) por fila.
+    """
+    cantidad = len(inicios) - 1
+    if datos.USAR_ARROW:
+        import pyarrow as pa
+        arreglo = pa.LargeStringArray.from_buffers(cantidad, pa.py_buffer(inicios), pa.py_buffer(utf8),
+                                                   pa.py_buffer(validos))
+        return pd.Series(pd.array(arreglo, dtype=pd.StringDtype("pyarrow", na_value=np.nan)), copy=False)
+
+    contenido = utf8.tobytes()
+    nulos = ~np.unpackbits(validos, count=cantidad, bitorder="little").astype(bool)
+    return pd.Series([None if nulo else sys.intern(contenido[i:j].decode("utf-8"))
+                      for nulo, i, j in zip(nulos, inicios[:-1].tolist(), inicios[1:].tolist())], dtype=object)
+
+
+def _abrir_capa(nombre, descripcion, origen):
+    """
+    Reconstruye un GeoDataFrame a partir de los arreglos mapeados en memoria. Las
+    columnas de atributos siguen apuntando a los archivos; la geometría se copia.
+    """
+    def abrir(archivo):
+        return np.load(os.path.join(origen, archivo), mmap_mode="r")
+
+    desplazamientos = tuple(abrir(f"{nombre}_desplazamientos_{i}.npy") for i in range(descripcion["niveles"]))
+    geometria = shapely.from_ragged_array(shapely.GeometryType(descripcion["tipo_geometria"]),
+                                          abrir(f"{nombre}_coords.npy"), desplazamientos)
+
+    atributos = {}
+    for columna in descripcion["columnas"]:
+        base = f"{nombre}_{columna['nombre']}"
+        if columna["tipo"] == "categoria":
+            atributos[columna["nombre"]] = pd.Series(pd.Categorical.from_codes(
+                abrir(base + "_codigos.npy"), categories=columna["categorias"]), copy=False)
+        elif columna["tipo"] == "texto":
+            atributos[columna["nombre"]] = _texto_mapeado(abrir(base + "_utf8.npy"), abrir(base + "_inicios.npy"),
+                                                          abrir(base + "_validos.npy"))
+        else:
+            atributos[columna["nombre"]] = pd.Series(abrir(base + ".npy"), copy=False)
+
+    # copy=False en ambos constructores: si no, pandas copia las columnas fuera del mapeo
+    tabla = pd.DataFrame(atributos, index=pd.RangeIndex(len(geometria)), copy=False)
+    return gpd.GeoDataFrame(tabla, geometry=geometria, crs=descripcion["crs"], copy=False)
+
+
+def publicar(huella, predios, zonas, reserva_gdf):
+    """
+    Publica las capas de una versión de datos. Se escribe en un directorio temporal
+    que se renombra al final, así que ningún worker ve un almacén incompleto; si otro
+    worker publicó primero, se descarta la copia propia.
+    """
+    os.makedirs(DIRECTORIO_ALMACEN, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=f".almacen_{huella}_", dir=DIRECTORIO_ALMACEN)
+    try:
+        meta = {nombre: _guardar_capa(gdf, nombre, temporal)
+                for nombre, gdf in zip(CAPAS, (predios, zonas, reserva_gdf))}
+        with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.rename(temporal, _directorio(huella))
+    except OSError:
+        if not os.path.exists(os.path.join(_directorio(huella), "meta.json")):
+            raise
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    podar(huella)
+
+
+def _fecha_publicacion(entrada):
+    try:
+        return entrada.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0  # Lo podó otro worker
+
+
+def podar(huella_actual):
+    """
+    Elimina los almacenes de versiones de datos anteriores, salvo el publicado más
+    recientemente antes de huella_actual: puede haber workers que aún lo estén
+    adjuntando. Los workers que ya mapearon archivos eliminados los conservan hasta
+    cerrarlos (en POSIX borrar un archivo mapeado no invalida el mapeo); donde no se
+    puedan borrar (Windows) se reintentará en la siguiente publicación.
+    """
+    vigente = os.path.basename(_directorio(huella_actual))
+    anteriores = [entrada for entrada in os.scandir(DIRECTORIO_ALMACEN)
+                  if entrada.is_dir() and entrada.name.startswith("almacen_") and entrada.name != vigente]
+    anteriores.sort(key=_fecha_publicacion)
+    for entrada in anteriores[:-1]:
+        shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+def adjuntar(huella):
+    """
+    Devuelve (predios, zonas, reserva_gdf) desde el almacén publicado, o None si no existe.
+    """
+    origen = _directorio(huella)
+    ruta_meta = os.path.join(origen, "meta.json")
+    if not os.path.exists(ruta_meta):
+        return None
+
+    with open(ruta_meta, encoding="utf-8") as f:
+        meta = json.load(f)
+    return tuple(_abrir_capa(nombre, meta[nombre], origen) for nombre in CAPAS)
+
+
+def cargar_capas(huella):
+    """
+    Devuelve las capas de la versión de datos indicada: las adjunta si otro worker
+    ya las publicó o, si no, las lee de los shapefiles y las publica.
+    """
+    if not ALMACEN_ACTIVO:
+        return datos.leer_capas()
+
+    try:
+        capas = adjuntar(huella)
+    except OSError as e:
+        # Otro worker podó el almacén mientras se adjuntaba
+        warnings.warn(f"No se pudo adjuntar el almacén compartido; este worker lee los shapefiles: {e}")
+        return datos.leer_capas()
+    if capas is None:
+        capas = datos.leer_capas()
+        try:
+            publicar(huella, *capas)
+        except Exception as e:
+            warnings.warn(f"No se pudo publicar el almacén compartido; este worker usa su propia copia: {e}")
+    return capas
+
+
+# --- MEDICIÓN DE MEMORIA POR WORKER ---
+
+def _rss_mb():
+    """
+    Memoria residente actual del proceso en MB (VmRSS en Linux; si no, el máximo de
+    getrusage, o NaN donde no existe el módulo resource, como en Windows).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _medir_en_proceso(huella, adjuntando):
+    """
+    Carga las capas como lo hace un worker (incluido el índice espacial de predios) y
+    devuelve (segundos, aumento de la memoria residente en MB).
+    """
+    rss_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    predios, _, _ = adjuntar(huella) if adjuntando else datos.leer_capas()
+    predios.sindex
+    return time.perf_counter() - inicio, _rss_mb() - rss_inicial
+
+
+def medir_workers():
+    """
+    Compara, cada uno en un proceso nuevo, un worker que lee los shapefiles con uno que
+    adjunta el almacén publicado.
+    """
+    huella = datos.huella_datos()
+    if adjuntar(huella) is None:
+        publicar(huella, *datos.leer_capas())
+
+    for nombre, adjuntando in (("Leyendo los shapefiles", False), ("Adjuntando el almacén", True)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as ejecutor:
+            segundos, delta_mb = ejecutor.submit(_medir_en_proceso, huella, adjuntando).result()
+        print(f"{nombre}: {segundos:.2f} s | Memoria residente agregada por el worker: {delta_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén compartido de capas de Geolandy.")
+    parser.add_argument("--medir", action="store_true", help="Mide tiempo y memoria de un worker que lee vs. uno que adjunta")
+    if parser.parse_args().medir:
+        medir_workers()
@@ -0,0 +1,99 @@
+"""
+Módulo cache_reportes.py - Caché en disco de reportes PDF direccionada por contenido.
+
+Cada reporte se guarda con el nombre SHA-256 de su contenido lógico: CHIP, versión
+de la zonificación, huella de la geometría del predio y versión de la plantilla. Si
+cambia cualquiera de ellos la llave cambia, así que un reporte en caché nunca queda
+desactualizado; en cambio, una nueva capa de predios conserva los reportes de los
+predios que no cambiaron. El tamaño total se limita desalojando los reportes usados
+hace más tiempo.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import datos
+
+# Incrementar cuando cambie el contenido o el diseño de generar_pdf
+VERSION_PLANTILLA = "3"
+TAMANO_MAXIMO_BYTES = int(os.environ.get("GEOLANDY_CACHE_REPORTES_MB", "200")) * 1024 ** 2
+
+
+def _directorio():
+    directorio = datos.ruta_cache("reportes")
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def clave_reporte(chip, huella, *partes):
+    """
+    Calcula la llave del reporte a partir del CHIP, la versión de la zonificación, la
+    versión de la plantilla y cualquier otra parte que cambie su contenido.
+    """
+    texto = "|".join(str(p) for p in (chip, huella, VERSION_PLANTILLA) + partes)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def buscar(clave):
+    """
+    Devuelve la ruta del reporte en caché, o None. Un acierto actualiza su fecha de
+    modificación, que es la que usa el desalojo para saber cuál se usó más recientemente.
+    """
+    ruta = os.path.join(_directorio(), f"{clave}.pdf")
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        return None
+    return ruta
+
+
+def ruta_temporal():
+    """
+    Devuelve una ruta temporal en el mismo directorio de la caché (para poder moverla de forma atómica).
+    """
+    descriptor, ruta = tempfile.mkstemp(suffix=".pdf.tmp", dir=_directorio())
+    os.close(descriptor)
+    return ruta
+
+
+def guardar(ruta_generada, clave):
+    """
+    Mueve un reporte recién generado a la caché y desaloja los más antiguos si se
+    supera TAMANO_MAXIMO_BYTES. Devuelve la ruta final del reporte.
+    """
+    ruta = os.path.join(_directorio(), f"{clave}.pdf")
+    try:
+        os.replace(ruta_generada, ruta)
+    except PermissionError:
+        # En Windows no se puede reemplazar un reporte que otra sesión está sirviendo; con
+        # la misma llave el contenido es el mismo, así que se conserva el existente
+        if not os.path.exists(ruta):
+            raise
+        os.remove(ruta_generada)
+    desalojar()
+    return ruta
+
+
+def desalojar(tamano_maximo=TAMANO_MAXIMO_BYTES):
+    """
+    Elimina los reportes usados hace más tiempo hasta que la caché quepa en tamano_maximo.
+    """
+    reportes = []
+    for entrada in os.scandir(_directorio()):
+        if entrada.name.endswith(".pdf"):
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue  # Lo desalojó otra sesión
+            reportes.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamano for _, tamano, _ in reportes)
+    for _, tamano, ruta in sorted(reportes):
+        if total <= tamano_maximo:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
@@ -0,0 +1,95 @@
+"""
+Módulo clasificador_zonas.py - Zonificación de puntos arbitrarios en tiempo constante.
+
+Precalcula una grilla uniforme sobre la capa de zonificación. Cada celda guarda la
+zona que la contiene por completo, la marca de "fuera de la reserva" o, si cae en un
+borde, la lista de zonas candidatas. Solo los puntos en celdas de borde se prueban
+de forma exacta contra los polígonos preparados de sus candidatas.
+"""
+
+import numpy as np
+import shapely
+
+TAMANO_CELDA_M = 100.0
+
+# Valores especiales de la grilla (los demás son posiciones de zona en la capa)
+FUERA = -1
+BORDE = -2
+
+
+class ClasificadorZonas:
+    """
+    Grilla de zonificación en EPSG:9377. clasificar_puntos devuelve, para cada punto,
+    la posición (iloc) de su zona en la capa o FUERA si no cae en ninguna.
+    """
+
+    def __init__(self, zonas, tamano_celda=TAMANO_CELDA_M):
+        self.zonas = zonas
+        self.geometrias = np.asarray(zonas.geometry.values)
+        shapely.prepare(self.geometrias)
+
+        minx, miny, maxx, maxy = zonas.total_bounds
+        self.x0, self.y0, self.tamano = minx, miny, tamano_celda
+        # floor + 1: los puntos sobre el borde máximo (maxx o maxy) también caen en una celda
+        self.nx = int(np.floor((maxx - minx) / tamano_celda)) + 1
+        self.ny = int(np.floor((maxy - miny) / tamano_celda)) + 1
+
+        # Todas las celdas como cajas, en orden fila por fila (celda = iy * nx + ix)
+        iy, ix = np.divmod(np.arange(self.nx * self.ny), self.nx)
+        celdas = shapely.box(minx + ix * tamano_celda, miny + iy * tamano_celda,
+                             minx + (ix + 1) * tamano_celda, miny + (iy + 1) * tamano_celda)
+
+        arbol = shapely.STRtree(self.geometrias)
+        intersectan = arbol.query(celdas, predicate="intersects")
+        contenidas = arbol.query(celdas, predicate="within")
+        candidatas_por_celda = np.bincount(intersectan[0], minlength=len(celdas))
+
+        # Celdas dentro de una sola zona: respuesta directa
+        self.grilla = np.full(len(celdas), FUERA, dtype=np.int32)
+        unicas = candidatas_por_celda[contenidas[0]] == 1
+        self.grilla[contenidas[0][unicas]] = contenidas[1][unicas]
+
+        # Celdas de borde: zonas candidatas en formato CSR (inicio[c]:inicio[c + 1])
+        self.grilla[(candidatas_por_celda > 0) & (self.grilla == FUERA)] = BORDE
+        orden = np.lexsort((intersectan[1], intersectan[0]))
+        self.candidatas = intersectan[1][orden]
+        self.inicio = np.concatenate([[0], np.cumsum(candidatas_por_celda)])
+
+    def clasificar_puntos(self, x, y):
+        """
+        Clasifica arreglos de coordenadas x, y (EPSG:9377) de forma vectorizada.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        fx = np.floor((x - self.x0) / self.tamano)
+        fy = np.floor((y - self.y0) / self.tamano)
+        # Las comparaciones con NaN son falsas: las coordenadas no finitas quedan fuera
+        validos = (fx >= 0) & (fx < self.nx) & (fy >= 0) & (fy < self.ny)
+
+        resultado = np.full(len(x), FUERA, dtype=np.int32)
+        celda = np.where(validos, fy * self.nx + fx, 0).astype(np.int64)
+        resultado[validos] = self.grilla[celda[validos]]
+
+        pendientes = np.flatnonzero(resultado == BORDE)
+        if len(pendientes) == 0:
+            return resultado
+        resultado[pendientes] = FUERA
+
+        # Un par (punto, zona candidata) por cada candidata de la celda del punto
+        celdas_pendientes = celda[pendientes]
+        conteos = self.inicio[celdas_pendientes + 1] - self.inicio[celdas_pendientes]
+        puntos = np.repeat(pendientes, conteos)
+        desplazamiento = self.inicio[celdas_pendientes] - (np.cumsum(conteos) - conteos)
+        zonas = self.candidatas[np.arange(conteos.sum()) + np.repeat(desplazamiento, conteos)]
+
+        dentro = shapely.intersects_xy(self.geometrias[zonas], x[puntos], y[puntos])
+        # En orden inverso, para que ante zonas superpuestas gane la primera de la capa
+        resultado[puntos[dentro][::-1]] = zonas[dentro][::-1]
+        return resultado
+
+    def zona_en(self, x, y):
+        """
+        Devuelve la fila de la zonificación que contiene el punto (x, y), o None.
+        """
+        posicion = self.clasificar_puntos([x], [y])[0]
+        return None if posicion == FUERA else self.zonas.iloc[posicion]
@@ -0,0 +1,3 @@
+"""
+Configuración de pytest: permite importar los módulos de la raíz desde tests/.
+"""
@@ -0,0 +1,90 @@
+"""
+Módulo consultas.py - Consultas espaciales sobre la capa de predios.
+
+Todas las búsquedas usan el índice espacial (STRtree) de la capa, de modo que
+su costo depende del número de predios candidatos y no del total de predios.
+"""
+
+import numpy as np
+
+import estadisticas
+
+# Parámetros por defecto de la búsqueda de predios cercanos
+DISTANCIA_CERCANOS_M = 50.0
+K_CERCANOS = 3
+
+# Radio por defecto de un área de interés alrededor de un punto
+RADIO_AREA_M = 200.0
+
+COLUMNAS_TOTALES = ("AREA_PREDIO", "AREA_AFECTADA", "PORCENTAJE")
+
+
+def _zonas_por_chip(tabla):
+    """
+    Devuelve, para cada CHIP de una tabla de afectación, las zonas que lo intersectan.
+    """
+    columnas_zonas = [c for c in tabla.columns if c not in COLUMNAS_TOTALES]
+    return {
+        chip: ", ".join(zona for zona in columnas_zonas if fila[zona] > 0)
+        for chip, fila in tabla.iterrows()
+    }
+
+
+def predios_cercanos(predios, punto, distancia_max=DISTANCIA_CERCANOS_M, k=K_CERCANOS):
+    """
+    Devuelve los k predios más cercanos a un punto (EPSG:9377) a no más de
+    distancia_max metros, ordenados por distancia (columna DISTANCIA_M).
+    Solo se miden distancias a los candidatos que devuelve el índice espacial.
+    """
+    posiciones = predios.sindex.query(punto, predicate="dwithin", distance=distancia_max)
+    candidatos = predios.iloc[np.sort(posiciones)]
+
+    distancias = candidatos.distance(punto).to_numpy()
+    orden = np.argsort(distancias, kind="stable")[:k]
+
+    cercanos = candidatos.iloc[orden].copy()
+    cercanos["DISTANCIA_M"] = distancias[orden]
+    return cercanos
+
+
+def afectacion_cercanos(cercanos, zonas):
+    """
+    Añade a los predios cercanos el porcentaje afectado y las zonas que los
+    intersectan, calculados en una sola superposición para todos ellos.
+    """
+    tabla = estadisticas.tabla_afectacion(cercanos, zonas)
+    zonas_por_chip = _zonas_por_chip(tabla)
+
+    resumen = cercanos[["CHIP", "DISTANCIA_M"]].copy()
+    resumen["PORCENTAJE"] = resumen["CHIP"].map(tabla["PORCENTAJE"]).fillna(0.0)
+    resumen["ZONAS"] = resumen["CHIP"].map(zonas_por_chip).fillna("")
+    return resumen
+
+
+def predios_en_area(predios, area):
+    """
+    Devuelve los predios que intersectan un área de interés (polígono en EPSG:9377),
+    con el área de cada uno dentro de ella (columna AREA_EN_AREA_M2). El índice
+    espacial devuelve todos los candidatos en una sola consulta.
+    """
+    posiciones = predios.sindex.query(area, predicate="intersects")
+    en_area = predios.iloc[np.sort(posiciones)].copy()
+    en_area["AREA_EN_AREA_M2"] = en_area.geometry.intersection(area).area
+    return en_area
+
+
+def afectacion_area(en_area, zonas):
+    """
+    Calcula en una sola superposición la afectación de todos los predios de un
+    área de interés. Devuelve (tabla, agregados): la tabla tiene una fila por CHIP
+    con el área del predio, el área dentro del área de interés, el área en cada
+    zona, el área afectada, el porcentaje afectado y las zonas que lo intersectan
+    (columna ZONAS); los agregados son los de estadisticas.resumir.
+    """
+    tabla = estadisticas.tabla_afectacion(en_area, zonas)
+    agregados = estadisticas.resumir(tabla)
+
+    resumen = tabla.copy()
+    resumen.insert(1, "AREA_EN_AREA", en_area.groupby("CHIP")["AREA_EN_AREA_M2"].sum())
+    resumen["ZONAS"] = resumen.index.map(_zonas_por_chip(tabla))
+    return resumen.rename_axis("CHIP").reset_index(), agregados
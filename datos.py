@@ -0,0 +1,236 @@
+"""
+Módulo datos.py - Rutas, lectura y versión de las capas geoespaciales de Geolandy.
+
+No depende de Streamlit, de modo que lo usan tanto la aplicación (landy4.py)
+como los scripts de línea de comandos.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+# --- RUTAS Y SISTEMA DE REFERENCIA ---
+DIRECTORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+RUTA_PREDIOS_ORIGINAL = os.path.join(DIRECTORIO_BASE, "PREDIOS_RFPBOB_2025.shp")
+RUTA_ZONAS_ORIGINAL = os.path.join(DIRECTORIO_BASE, "Zonificacion_Ambiental_RFP_Bosque_Oriental_de_Bogota2.shp")
+DIRECTORIO_LIMPIOS = os.path.join(DIRECTORIO_BASE, "datos_limpios")
+DIRECTORIO_CACHE = os.environ.get("GEOLANDY_CACHE", os.path.join(DIRECTORIO_BASE, "cache"))
+
+EPSG_TRABAJO = 9377
+EXTENSIONES_SHAPEFILE = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+# Índices espaciales y metadatos que generan ArcGIS/QGIS junto al shapefile: no forman
+# parte de los datos, pero GDAL usa el .sbn/.sbx si existe, aunque sea de otra versión
+EXTENSIONES_AUXILIARES = (".sbn", ".sbx", ".qix", ".shp.xml")
+
+# --- COLUMNAS QUE USA LA APLICACIÓN ---
+COLUMNAS_PREDIOS = ["CHIP"]
+COLUMNAS_ZONAS = ["ZONIFICACI", "DESCRIPCI", "ACTO_ZONIF", "ACT_PERMIT", "ACT_PROHIB"]
+COLUMNAS_CATEGORICAS = ["ZONIFICACI", "ACTO_ZONIF"]
+COLUMNAS_TEXTO_LARGO = ["DESCRIPCI", "ACT_PERMIT", "ACT_PROHIB"]
+
+# El lector Arrow de pyogrio solo está disponible si pyarrow está instalado
+USAR_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def ruta_capa(ruta_original):
+    """
+    Devuelve la ruta de la capa limpia (generada por validar_datos.py) si existe,
+    o la de la capa original.
+    """
+    limpia = os.path.join(DIRECTORIO_LIMPIOS, os.path.basename(ruta_original))
+    return limpia if os.path.exists(limpia) else ruta_original
+
+
+# Capas que lee la aplicación
+RUTA_PREDIOS = ruta_capa(RUTA_PREDIOS_ORIGINAL)
+RUTA_ZONAS = ruta_capa(RUTA_ZONAS_ORIGINAL)
+
+# Huellas ya calculadas, indexadas por (ruta, tamaño, fecha de modificación)
+_huellas = {}
+
+
+def componentes_shapefile(ruta_shp):
+    """
+    Devuelve las rutas existentes de los archivos que componen un shapefile.
+    """
+    base, _ = os.path.splitext(ruta_shp)
+    return [base + ext for ext in EXTENSIONES_SHAPEFILE if os.path.exists(base + ext)]
+
+
+def auxiliares_shapefile(ruta_shp):
+    """
+    Devuelve las rutas existentes de los índices y metadatos auxiliares de un shapefile.
+    """
+    base, _ = os.path.splitext(ruta_shp)
+    return [base + ext for ext in EXTENSIONES_AUXILIARES if os.path.exists(base + ext)]
+
+
+def huella_datos(rutas_shp=(RUTA_PREDIOS, RUTA_ZONAS)):
+    """
+    Calcula la versión (huella SHA-1 del contenido) de las capas de datos.
+    El contenido solo se vuelve a leer si cambia el tamaño o la fecha de algún archivo.
+    """
+    archivos = [c for ruta in rutas_shp for c in componentes_shapefile(ruta)]
+    firma = tuple((ruta, os.stat(ruta).st_size, os.stat(ruta).st_mtime_ns) for ruta in archivos)
+
+    if firma not in _huellas:
+        h = hashlib.sha1()
+        for ruta in archivos:
+            h.update(os.path.basename(ruta).encode("utf-8"))
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(1 << 20), b""):
+                    h.update(bloque)
+        _huellas[firma] = h.hexdigest()[:16]
+
+    return _huellas[firma]
+
+
+def huella_zonas():
+    """
+    Versión de la capa de zonificación sola. Las cachés por predio se indexan con ella
+    y con la huella de la geometría del predio, no con la versión de ambas capas, de
+    modo que actualizar la capa de predios no invalida los predios que no cambiaron.
+    """
+    return huella_datos((RUTA_ZONAS,))
+
+
+def huellas_geometrias(geometrias):
+    """
+    Devuelve la huella SHA-1 (hexadecimal) de cada geometría, calculada sobre su WKB
+    normalizado para que no dependa del orden de los vértices ni de los anillos.
+    """
+    wkb = shapely.to_wkb(shapely.normalize(np.asarray(geometrias)), hex=False)
+    return [hashlib.sha1(g).hexdigest() for g in wkb]
+
+
+def combinar_huellas(huellas):
+    """
+    Combina las huellas de los polígonos de un mismo CHIP en una sola (sin importar su orden).
+    Es la huella que guarda el manifiesto de actualizar_datos.py para cada predio.
+    """
+    return hashlib.sha1("".join(sorted(huellas)).encode()).hexdigest()
+
+
+def ruta_cache(nombre):
+    """
+    Devuelve la ruta de un archivo dentro del directorio de caché, creándolo si no existe.
+    """
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    return os.path.join(DIRECTORIO_CACHE, nombre)
+
+
+def _leer_shapefile(ruta, columnas):
+    """
+    Lee solo las columnas indicadas de un shapefile con pyogrio (vía Arrow si es posible)
+    y lo reproyecta a EPSG:9377.
+    """
+    gdf = gpd.read_file(ruta, engine="pyogrio", use_arrow=USAR_ARROW, columns=columnas)
+    return gdf.to_crs(epsg=EPSG_TRABAJO)
+
+
+def compactar_zonas(zonas):
+    """
+    Guarda los textos repetidos de la zonificación como categorías e interna los
+    textos largos, de modo que cada texto exista una sola vez en memoria.
+    """
+    zonas = zonas.copy()
+    for columna in COLUMNAS_CATEGORICAS:
+        zonas[columna] = zonas[columna].astype("category")
+    for columna in COLUMNAS_TEXTO_LARGO:
+        zonas[columna] = zonas[columna].map(lambda t: sys.intern(t) if isinstance(t, str) else t)
+    return zonas
+
+
+def leer_capas(optimizada=True):
+    """
+    Lee los shapefiles de predios y zonificación, los reproyecta a EPSG:9377
+    y construye el límite de la reserva (unión de todas las zonas).
+    Con optimizada=False se usa la lectura completa por defecto de gpd.read_file
+    (solo para comparar tiempos y memoria con medir_carga).
+    """
+    if optimizada:
+        predios = _leer_shapefile(RUTA_PREDIOS, COLUMNAS_PREDIOS)
+        zonas = compactar_zonas(_leer_shapefile(RUTA_ZONAS, COLUMNAS_ZONAS))
+    else:
+        predios = gpd.read_file(RUTA_PREDIOS).to_crs(epsg=EPSG_TRABAJO)
+        zonas = gpd.read_file(RUTA_ZONAS).to_crs(epsg=EPSG_TRABAJO)
+
+    limite_reserva = zonas.geometry.union_all()
+    reserva_gdf = gpd.GeoDataFrame(geometry=[limite_reserva], crs=zonas.crs)
+
+    return predios, zonas, reserva_gdf
+
+
+def precalcular_geometria(predios, reserva_gdf):
+    """
+    Precalcula, en el orden de la capa de predios, el área (m²), los límites
+    [minx, miny, maxx, maxy] y el centroide [x, y] de cada predio en EPSG:9377 y en
+    WGS84, además de los límites de la reserva. Así las vistas y el reporte no
+    repiten reproyecciones ni cálculos de geometría en cada consulta.
+    """
+    centroides = predios.geometry.centroid
+
+    return {
+        "area": predios.geometry.area.to_numpy(),
+        "limites": predios.geometry.bounds.to_numpy(),
+        "limites_wgs84": predios.geometry.to_crs(epsg=4326).bounds.to_numpy(),
+        "centroide": shapely.get_coordinates(centroides.values),
+        "centroide_wgs84": shapely.get_coordinates(centroides.to_crs(epsg=4326).values),
+        "limites_reserva": reserva_gdf.total_bounds,
+        "limites_reserva_wgs84": reserva_gdf.to_crs(epsg=4326).total_bounds,
+    }
+
+
+def limites_conjuntos(limites):
+    """
+    Une los límites [minx, miny, maxx, maxy] de varias filas en uno solo.
+    """
+    limites = np.atleast_2d(limites)
+    return np.array([limites[:, 0].min(), limites[:, 1].min(), limites[:, 2].max(), limites[:, 3].max()])
+
+
+# --- MEDICIÓN DE CARGA ---
+
+def _medir_en_proceso(optimizada):
+    """
+    Carga las capas y devuelve (segundos, RSS máximo del proceso en MB, memoria de los GeoDataFrames en MB).
+    El RSS es NaN donde no existe el módulo resource (Windows).
+    """
+    inicio = time.perf_counter()
+    capas = leer_capas(optimizada)
+    segundos = time.perf_counter() - inicio
+
+    try:
+        import resource
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        rss_mb = float("nan")
+    memoria_mb = sum(gdf.memory_usage(deep=True).sum() for gdf in capas) / 1024 ** 2
+    return segundos, rss_mb, memoria_mb
+
+
+def medir_carga():
+    """
+    Compara la lectura por defecto con la optimizada, cada una en un proceso nuevo
+    para que el RSS reportado sea el de un worker recién iniciado.
+    """
+    for nombre, optimizada in (("Antes (gpd.read_file completo)", False), ("Después (Arrow + columnas)", True)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as ejecutor:
+            segundos, rss_mb, memoria_mb = ejecutor.submit(_medir_en_proceso, optimizada).result()
+        print(f"{nombre}: {segundos:.2f} s | RSS del worker: {rss_mb:.1f} MB | GeoDataFrames: {memoria_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades de datos de Geolandy.")
+    parser.add_argument("--medir", action="store_true", help="Reporta tiempo de carga y memoria antes y después de la optimización")
+    if parser.parse_args().medir:
+        medir_carga()
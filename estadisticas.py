@@ -0,0 +1,135 @@
+"""
+Módulo estadisticas.py - Afectación de todos los predios de la reserva.
+
+Calcula en una sola superposición vectorizada (todos los predios x todas las zonas)
+el área de cada predio en cada zona y guarda en disco la tabla resultante y sus
+agregados, una vez por versión de los datos.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import datos
+
+# Rangos de porcentaje de afectación para la distribución del tablero
+RANGOS_AFECTACION = [-np.inf, 0, 25, 50, 75, 100]
+ETIQUETAS_RANGOS = ["Sin afectación", "0 - 25 %", "25 - 50 %", "50 - 75 %", "75 - 100 %"]
+
+
+def tabla_afectacion(predios, zonas):
+    """
+    Devuelve una tabla indexada por CHIP con el área del predio (AREA_PREDIO),
+    el área en cada zona (una columna por ZONIFICACI), el área afectada total
+    (AREA_AFECTADA) y el porcentaje afectado (PORCENTAJE). Todas las áreas en m².
+    """
+    predios = predios[["CHIP", "geometry"]]
+
+    piezas = gpd.overlay(predios, zonas[["ZONIFICACI", "geometry"]], how="intersection", keep_geom_type=True)
+    piezas["AREA_M2"] = piezas.geometry.area
+
+    por_zona = piezas.pivot_table(index="CHIP", columns="ZONIFICACI", values="AREA_M2",
+                                  aggfunc="sum", fill_value=0.0, observed=True)
+    por_zona.columns = por_zona.columns.astype(str)
+    por_zona.columns.name = None
+
+    tabla = predios.geometry.area.groupby(predios["CHIP"]).sum().to_frame("AREA_PREDIO")
+    tabla = tabla.join(por_zona, how="left").fillna(0.0)
+    return completar_totales(tabla)
+
+
+def completar_totales(tabla):
+    """
+    Recalcula AREA_AFECTADA y PORCENTAJE a partir de las columnas por zona.
+    """
+    columnas_zonas = [c for c in tabla.columns if c not in ("AREA_PREDIO", "AREA_AFECTADA", "PORCENTAJE")]
+    tabla = tabla.copy()
+    tabla["AREA_AFECTADA"] = tabla[columnas_zonas].sum(axis=1)
+
+    area_predio = tabla["AREA_PREDIO"].to_numpy()
+    porcentaje = np.divide(tabla["AREA_AFECTADA"].to_numpy() * 100, area_predio,
+                           out=np.zeros(len(tabla)), where=area_predio > 0)
+    tabla["PORCENTAJE"] = np.clip(porcentaje, 0, 100)
+    return tabla
+
+
+def resumir(tabla):
+    """
+    Calcula los agregados del tablero: totales, predios y hectáreas por zona
+    y distribución de los porcentajes de afectación.
+    """
+    columnas_zonas = [c for c in tabla.columns if c not in ("AREA_PREDIO", "AREA_AFECTADA", "PORCENTAJE")]
+
+    por_zona = [
+        {
+            "ZONIFICACI": zona,
+            "predios": int((tabla[zona] > 0).sum()),
+            "hectareas": float(tabla[zona].sum() / 10000),
+        }
+        for zona in columnas_zonas
+    ]
+
+    rangos = pd.cut(tabla["PORCENTAJE"], bins=RANGOS_AFECTACION, labels=ETIQUETAS_RANGOS)
+    conteo = rangos.value_counts().reindex(ETIQUETAS_RANGOS, fill_value=0)
+
+    return {
+        "total_predios": int(len(tabla)),
+        "predios_afectados": int((tabla["AREA_AFECTADA"] > 0).sum()),
+        "area_total_ha": float(tabla["AREA_PREDIO"].sum() / 10000),
+        "area_afectada_ha": float(tabla["AREA_AFECTADA"].sum() / 10000),
+        "por_zona": por_zona,
+        "distribucion": [{"rango": r, "predios": int(n)} for r, n in conteo.items()],
+    }
+
+
+def _rutas(huella):
+    return (datos.ruta_cache(f"afectacion_{huella}.csv"),
+            datos.ruta_cache(f"estadisticas_{huella}.json"))
+
+
+def guardar(tabla, resumen, huella):
+    """
+    Escribe en caché la tabla de afectación y sus agregados para una versión de los datos.
+    La escritura es atómica para que otro proceso nunca lea un archivo a medias.
+    """
+    ruta_tabla, ruta_resumen = _rutas(huella)
+    resumen = dict(resumen, version=huella, generado=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    tabla.to_csv(ruta_tabla + ".tmp", index_label="CHIP")
+    os.replace(ruta_tabla + ".tmp", ruta_tabla)
+
+    with open(ruta_resumen + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_resumen + ".tmp", ruta_resumen)
+
+    return resumen
+
+
+def leer_tabla(huella):
+    """
+    Devuelve la tabla de afectación en caché para una versión de los datos, o None.
+    """
+    ruta_tabla, _ = _rutas(huella)
+    if not os.path.exists(ruta_tabla):
+        return None
+    return pd.read_csv(ruta_tabla, index_col="CHIP")
+
+
+def cargar_o_calcular(predios, zonas, huella):
+    """
+    Devuelve (tabla, resumen) desde la caché en disco o, si no existen para
+    esta versión de los datos, los calcula y los guarda.
+    """
+    ruta_tabla, ruta_resumen = _rutas(huella)
+    tabla = leer_tabla(huella)
+
+    if tabla is not None and os.path.exists(ruta_resumen):
+        with open(ruta_resumen, encoding="utf-8") as f:
+            return tabla, json.load(f)
+
+    tabla = tabla_afectacion(predios, zonas)
+    return tabla, guardar(tabla, resumir(tabla), huella)
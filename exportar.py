@@ -0,0 +1,113 @@
+"""
+Módulo exportar.py - Exportación de resultados a GeoJSON, GeoPackage y CSV.
+
+Los resultados se calculan y se escriben por lotes de predios: cada lote se intersecta
+con la zonificación y se escribe en el archivo antes de pasar al siguiente, de modo que
+exportar miles de predios no arma el archivo completo en memoria.
+"""
+
+import csv
+import json
+
+import geopandas as gpd
+import pandas as pd
+import pyogrio
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    "GeoJSON": ("geojson", "application/geo+json"),
+    "GeoPackage": ("gpkg", "application/geopackage+sqlite3"),
+    "CSV": ("csv", "text/csv"),
+}
+TAMANO_LOTE = 500
+COLUMNAS_PREDIO = ["CHIP", "AREA_M2"]
+COLUMNAS_ZONA = ["CHIP", "ZONIFICACI", "ACTO_ZONIF", "AREA_M2"]
+
+
+def lotes_resultados(predios, zonas, chips, tamano=TAMANO_LOTE):
+    """
+    Genera, lote por lote, (predios_lote, interseccion_lote) para los CHIP indicados,
+    con el área en m² de cada geometría en la columna AREA_M2.
+    """
+    chips = list(dict.fromkeys(chips))
+    posiciones = predios.reset_index(drop=True).groupby("CHIP").indices
+
+    for i in range(0, len(chips), tamano):
+        filas = [p for chip in chips[i:i + tamano] for p in posiciones.get(chip, ())]
+        if not filas:
+            continue
+
+        lote = predios.iloc[filas][["CHIP", "geometry"]].copy()
+        lote["AREA_M2"] = lote.geometry.area
+
+        interseccion = gpd.overlay(lote[["CHIP", "geometry"]], zonas, how="intersection", keep_geom_type=False)
+        interseccion["AREA_M2"] = interseccion.geometry.area
+
+        yield lote[COLUMNAS_PREDIO + ["geometry"]], interseccion[COLUMNAS_ZONA + ["geometry"]]
+
+
+def _sin_categorias(gdf):
+    return gdf.astype({c: str for c in gdf.columns if isinstance(gdf[c].dtype, pd.CategoricalDtype)})
+
+
+def escribir_geojson(lotes, ruta):
+    """
+    Escribe una FeatureCollection en WGS84 (RFC 7946) feature por feature.
+    La propiedad CAPA distingue el predio ("predio") de sus zonas ("zona_afectada").
+    """
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        primera = True
+        for lote, interseccion in lotes:
+            for capa, gdf in (("predio", lote), ("zona_afectada", interseccion)):
+                for feature in _sin_categorias(gdf).to_crs(epsg=4326).iterfeatures(na="null", drop_id=True):
+                    feature["properties"] = {"CAPA": capa, **feature["properties"]}
+                    f.write(("" if primera else ",\n") + json.dumps(feature, ensure_ascii=False))
+                    primera = False
+        f.write("\n]}\n")
+
+
+def escribir_geopackage(lotes, ruta):
+    """
+    Escribe las capas "predios" y "zonas_afectadas" (EPSG:9377) agregando un lote a la vez.
+    """
+    creadas = set()
+    for lote, interseccion in lotes:
+        for capa, gdf in (("predios", lote), ("zonas_afectadas", interseccion)):
+            if gdf.empty:
+                continue
+            pyogrio.write_dataframe(_sin_categorias(gdf), ruta, layer=capa, driver="GPKG",
+                                    append=capa in creadas)
+            creadas.add(capa)
+
+
+def escribir_csv(lotes, ruta):
+    """
+    Escribe una fila por predio y por zona afectada, con la geometría en WKT (EPSG:9377).
+    """
+    columnas = ["CAPA", "CHIP", "ZONIFICACI", "ACTO_ZONIF", "AREA_M2", "WKT"]
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(columnas)
+        for lote, interseccion in lotes:
+            for capa, gdf in (("predio", lote), ("zona_afectada", interseccion)):
+                filas = gdf.drop(columns="geometry").reindex(columns=columnas[1:5])
+                filas.insert(0, "CAPA", capa)
+                filas["WKT"] = gdf.geometry.to_wkt()
+                escritor.writerows(filas.astype(object).where(filas.notna(), "").itertuples(index=False))
+
+
+ESCRITORES = {"GeoJSON": escribir_geojson, "GeoPackage": escribir_geopackage, "CSV": escribir_csv}
+
+
+def exportar(predios, zonas, chips, formato, ruta):
+    """
+    Exporta el predio y las zonas afectadas de cada CHIP al archivo indicado y devuelve
+    cuántos CHIP se encontraron. Si no se encontró ninguno no se escribe el archivo, en
+    ningún formato.
+    """
+    encontrados = predios.loc[predios["CHIP"].isin(set(chips)), "CHIP"].nunique()
+    if encontrados == 0:
+        return 0
+    ESCRITORES[formato](lotes_resultados(predios, zonas, chips), ruta)
+    return encontrados
@@ -2,17 +2,35 @@ import streamlit as st
 import geopandas as gpd
 import pandas as pd
 import folium
-from shapely.geometry import Point
+from folium.plugins import Draw
+import streamlit.components.v1 as components
 from streamlit_folium import st_folium
+from shapely.geometry import Point, shape
 from fpdf import FPDF
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.patches import FancyArrowPatch
+import json
 import os
 import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import numpy as np 
 
+import almacen_compartido
+import cache_reportes
+import clasificador_zonas
+import consultas
+import datos
+import estadisticas
+import exportar
+import normativa
+import perfilador
+import vuelo_unico
+
 # --- CONFIGURACIÓN DE PÁGINA Y CSS (MEJORA DE INTERFAZ) ---
 st.set_page_config(
     page_title="Geolandy - Consulta Ambiental",
@@ -61,7 +79,11 @@ def formatear_area(area_m2, formato_reporte=False):
     """
     Formatea el área. Si es para el reporte (formato_reporte=True),
     muestra ha (m²). De lo contrario, usa la unidad más grande.
+    Si recibe un arreglo o una Serie de áreas, devuelve un arreglo de textos.
     """
+    if np.ndim(area_m2) > 0:
+        return formatear_areas(area_m2, formato_reporte)
+
     area_m2 = float(area_m2)
     area_ha = area_m2 / 10000
 
@@ -75,41 +97,507 @@ def formatear_area(area_m2, formato_reporte=False):
     else:
         return f"{area_ha:,.2f} ha"
 
-@st.cache_data
-def cargar_datos():
+
+def formatear_areas(areas_m2, formato_reporte=False):
     """
-    Carga los archivos geoespaciales, los reproyecta a EPSG:9377
-    y aplica el mapeo de nombres a la columna ZONIFICACI.
+    Versión vectorizada de formatear_area: la unidad y el valor de cada área se
+    eligen con NumPy y solo queda por elemento la conversión a texto.
     """
-    try:
-        # Cargar y reproyectar a EPSG:9377 
-        predios = gpd.read_file("PREDIOS_RFPBOB_2025.shp").to_crs(epsg=9377)
-        zonas = gpd.read_file("Zonificacion_Ambiental_RFP_Bosque_Oriental_de_Bogota2.shp").to_crs(epsg=9377)
-        
-        # Crear límite de la reserva (unión de todas las zonas)
-        limite_reserva = zonas.geometry.union_all()
-        reserva_gdf = gpd.GeoDataFrame(geometry=[limite_reserva], crs=zonas.crs)
+    areas_m2 = np.asarray(areas_m2, dtype=float)
+    areas_ha = areas_m2 / 10000
+
+    if formato_reporte:
+        return np.array([f"{ha:,.2f} ha ({m2:,.2f} m²)" for ha, m2 in zip(areas_ha.tolist(), areas_m2.tolist())],
+                        dtype=object)
+
+    en_ha = areas_m2 >= 10000
+    valores = np.where(en_ha, areas_ha, areas_m2)
+    unidades = np.where(en_ha, "ha", "m²")
+    return np.array([f"{v:,.2f} {u}" for v, u in zip(valores.tolist(), unidades.tolist())], dtype=object)
+
 
-        return predios, zonas, reserva_gdf
+@st.cache_resource
+def pool_hilos():
+    """
+    Pool de hilos compartido por todas las sesiones para preparar en paralelo las partes
+    independientes de la vista de resultados. GEOS y PROJ liberan el GIL durante buena
+    parte de las reproyecciones y la serialización de geometrías.
+    """
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="geolandy")
+
+# Las cachés por versión de datos guardan una sola entrada: al actualizar los datos la
+# versión anterior se libera en lugar de quedar en memoria hasta reiniciar el servidor
+@st.cache_resource(max_entries=1)
+def cargar_datos(huella):
+    """
+    Carga las capas geoespaciales reproyectadas a EPSG:9377 y el límite de la reserva.
+    Si otro worker ya las publicó en el almacén compartido se adjuntan sin copiarlas;
+    como cache_resource no copia el resultado, todas las sesiones usan los mismos objetos.
+    La huella de los datos forma parte de la llave, así que una actualización se recarga sola.
+    """
+    try:
+        return almacen_compartido.cargar_capas(huella)
     except Exception as e:
         st.error(f"Error al cargar datos geoespaciales. Asegúrate de que los archivos .shp y sus complementos estén en el mismo directorio: {e}")
         return None, None, None
 
 
-# --- GENERACIÓN DE PDF MEJORADA ---
+@st.cache_data(max_entries=1, show_spinner="Calculando estadísticas de la reserva...")
+def cargar_estadisticas(huella, _predios, _zonas):
+    """
+    Devuelve los agregados de afectación de toda la reserva. Se calculan una sola
+    vez por versión de los datos y se guardan en disco (ver estadisticas.py).
+    """
+    _, resumen = estadisticas.cargar_o_calcular(_predios, _zonas, huella)
+    return resumen
 
-def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcentaje_afectado, reserva_gdf):
+
+@st.cache_resource(max_entries=1, show_spinner="Preparando la grilla de zonificación...")
+def cargar_clasificador(huella, _zonas):
+    """
+    Construye una vez por versión de la zonificación la grilla de zonas (ver clasificador_zonas.py).
+    """
+    return clasificador_zonas.ClasificadorZonas(_zonas)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Precalculando áreas y límites de los predios...")
+def cargar_geometria(huella, _predios, _reserva_gdf):
+    """
+    Arreglos NumPy de área, límites y centroides por predio (ver datos.precalcular_geometria).
+    """
+    return datos.precalcular_geometria(_predios, _reserva_gdf)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def cargar_normativa(huella, _zonas):
+    """
+    Actividades por zona y bloques de texto del reporte, procesados una vez por versión
+    de la zonificación (ver normativa.py).
+    """
+    return normativa.compilar(_zonas)
+
+
+# --- MAPAS FOLIUM (HTML EN CACHÉ) ---
+
+@st.cache_resource(max_entries=1)
+def mapa_contexto_base(huella, _reserva_gdf, bounds_reserva):
+    """
+    Construye una sola vez por versión de la zonificación el HTML del mapa de ubicación general
+    (límite de la reserva y encuadre). Devuelve (html, nombre de la variable JS del mapa).
+    """
+    mapa_general = folium.Map(
+        location=[(bounds_reserva[1] + bounds_reserva[3])/2, 
+                 (bounds_reserva[0] + bounds_reserva[2])/2],
+        zoom_start=11
+    )
     
-    chip_limpio = re.sub(r'[^\w]', '', chip)
-    archivo_mapa = f"mapa_temp_{chip_limpio}.png"
+    # Añadir límite de la reserva
+    folium.GeoJson(
+        _reserva_gdf.to_crs(epsg=4326).to_json(),
+        style_function=lambda x: {'fillColor': 'lightgreen', 
+                                 'color': 'darkgreen', 
+                                 'weight': 2,
+                                 'fillOpacity': 0.2},
+        tooltip=folium.Tooltip("Reserva Forestal Protectora")
+    ).add_to(mapa_general)
+    
+    # Ajustar vista a la reserva
+    mapa_general.fit_bounds([
+        [bounds_reserva[1], bounds_reserva[0]], 
+        [bounds_reserva[3], bounds_reserva[2]]
+    ])
+
+    return mapa_general.get_root().render(), mapa_general.get_name()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def mapas_predio(huella, huella_predio, referencia, _consulta, _interseccion, _reserva_gdf,
+                 bounds_reserva, centroide, bounds_predio):
+    """
+    Devuelve el HTML de los mapas de ubicación general y de detalle de un predio.
+    La llave es la versión de la zonificación y la huella de la geometría del predio;
+    se conservan los 256 predios más recientes. El mapa general reutiliza el HTML base y solo le agrega
+    el resaltado del predio.
+    """
+    # Las dos reproyecciones y los dos mapas son independientes: se preparan en el pool de hilos
+    html_base, nombre_mapa = mapa_contexto_base(huella, _reserva_gdf, bounds_reserva)
+    pool = pool_hilos()
+    futuro_consulta = pool.submit(_consulta.to_crs, epsg=4326)
+    futuro_interseccion = pool.submit(_interseccion.to_crs, epsg=4326)
+    consulta_wgs = futuro_consulta.result()
+
+    futuro_general = pool.submit(_html_mapa_general, html_base, nombre_mapa, consulta_wgs, referencia)
+    futuro_detalle = pool.submit(_html_mapa_detalle, consulta_wgs, futuro_interseccion.result(), referencia,
+                                 centroide, bounds_predio)
+    return futuro_general.result(), futuro_detalle.result()
+
+
+def _html_mapa_general(html_base, nombre_mapa, consulta_wgs, referencia):
+    """
+    MAPA 1: UBICACIÓN GENERAL (HTML base + capa del predio)
+    """
+    capa_predio = f"""<script>
+    L.geoJson({consulta_wgs.geometry.to_json()}, {{
+        style: function() {{ return {{fillColor: 'blue', color: 'darkblue', weight: 3, fillOpacity: 0.6}}; }}
+    }}).bindTooltip({json.dumps(f"Predio: {referencia}")}).addTo({nombre_mapa});
+</script>
+"""
+    inicio, cierre, fin = html_base.rpartition("</html>")
+    return inicio + capa_predio + cierre + fin
+
+
+def _html_mapa_detalle(consulta_wgs, interseccion_wgs, referencia, centroide, bounds_predio):
+    """
+    MAPA 2: MAPA DETALLADO DE AFECTACIÓN (Ajuste automático)
+    """
+    mapa_detalle = folium.Map(
+        location=[centroide[1], centroide[0]],
+        zoom_start=15
+    ) 
+    
+    # Añadir límite del predio
+    folium.GeoJson(
+        consulta_wgs.to_json(),
+        style_function=lambda x: {'fillColor': 'none', 
+                                 'color': 'blue', 
+                                 'weight': 3, 
+                                 'fillOpacity': 0.1},
+        tooltip=folium.Tooltip(f"Predio: {referencia}")
+    ).add_to(mapa_detalle)
+    
+    # Añadir zonas de afectación
+    folium.GeoJson(
+        interseccion_wgs.to_json(),
+        style_function=lambda x: {
+            'fillColor': COLORES_CATEGORIA.get(x['properties']['ZONIFICACI'], '#808080'),
+            'color': 'black',
+            'weight': 1,
+            'fillOpacity': 0.7
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['ZONIFICACI', 'ACTO_ZONIF'], 
+            aliases=['Zona:', 'Norma:']
+        )
+    ).add_to(mapa_detalle)
+    
+    # CORREGIDO: Ajustar vista automáticamente al predio
+    mapa_detalle.fit_bounds([
+        [bounds_predio[1], bounds_predio[0]], 
+        [bounds_predio[3], bounds_predio[2]]
+    ])
+
+    return mapa_detalle.get_root().render()
+
+
+# --- ÁREA DE INTERÉS ---
+
+# Por encima de este número de predios el mapa solo muestra el área de interés
+MAXIMO_PREDIOS_MAPA = 3000
+
+
+@st.cache_resource(max_entries=1)
+def reserva_geojson(huella, _reserva_gdf):
+    """
+    GeoJSON (WGS84) del límite de la reserva, para los mapas que se construyen en cada ejecución.
+    """
+    return _reserva_gdf.to_crs(epsg=4326).to_json()
+
+
+def mapa_dibujo(huella, reserva_gdf, bounds_reserva):
+    """
+    Mapa de la reserva con la herramienta para dibujar el polígono del área de interés.
+    """
+    mapa = folium.Map(
+        location=[(bounds_reserva[1] + bounds_reserva[3])/2,
+                 (bounds_reserva[0] + bounds_reserva[2])/2],
+        zoom_start=11
+    )
+    folium.GeoJson(
+        reserva_geojson(huella, reserva_gdf),
+        style_function=lambda x: {'fillColor': 'lightgreen',
+                                 'color': 'darkgreen',
+                                 'weight': 2,
+                                 'fillOpacity': 0.2}
+    ).add_to(mapa)
+    Draw(
+        draw_options={'polyline': False, 'circle': False, 'marker': False, 'circlemarker': False},
+        edit_options={'edit': False}
+    ).add_to(mapa)
+    mapa.fit_bounds([
+        [bounds_reserva[1], bounds_reserva[0]],
+        [bounds_reserva[3], bounds_reserva[2]]
+    ])
+    return mapa
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def mapa_area(huella, area_wkb, _area, _en_area, _tabla):
+    """
+    Devuelve (html, completo) del mapa de un área de interés con sus predios coloreados
+    según estén o no afectados. La llave es la versión de datos y el WKB del área.
+    Si hay más de MAXIMO_PREDIOS_MAPA predios solo se dibuja el área (completo=False).
+    """
+    area_wgs = gpd.GeoSeries([_area], crs=f"EPSG:{datos.EPSG_TRABAJO}").to_crs(epsg=4326)
+    minx, miny, maxx, maxy = area_wgs.total_bounds
+
+    mapa = folium.Map(location=[(miny + maxy)/2, (minx + maxx)/2], zoom_start=15)
+    folium.GeoJson(
+        area_wgs.to_json(),
+        style_function=lambda x: {'fillColor': 'none', 'color': 'black', 'weight': 2, 'dashArray': '5, 5'},
+        tooltip=folium.Tooltip("Área de interés")
+    ).add_to(mapa)
+
+    completo = len(_en_area) <= MAXIMO_PREDIOS_MAPA
+    if completo:
+        predios_wgs = _en_area[['CHIP', 'geometry']].to_crs(epsg=4326)
+        predios_wgs['PORCENTAJE'] = predios_wgs['CHIP'].map(_tabla.set_index('CHIP')['PORCENTAJE']).fillna(0.0).round(2)
+        folium.GeoJson(
+            predios_wgs.to_json(),
+            style_function=lambda x: {
+                'fillColor': '#FFA500' if x['properties']['PORCENTAJE'] > 0 else 'blue',
+                'color': 'darkblue',
+                'weight': 1,
+                'fillOpacity': 0.5
+            },
+            tooltip=folium.GeoJsonTooltip(fields=['CHIP', 'PORCENTAJE'], aliases=['CHIP:', 'Afectación (%):'])
+        ).add_to(mapa)
+
+    mapa.fit_bounds([[miny, minx], [maxy, maxx]])
+    return mapa.get_root().render(), completo
+
+
+def mostrar_estadisticas(resumen):
+    """
+    Dibuja el tablero de estadísticas de afectación de la reserva.
+    """
+    st.title("📊 Geolandy: Estadísticas de la Reserva")
+    st.markdown("Totales de afectación por zonificación para todos los predios de la Reserva Forestal Protectora Bosque Oriental de Bogotá.")
+    st.caption(f"Versión de datos: {resumen['version']} | Calculado el: {resumen['generado']}")
+
+    st.markdown("---")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(label="Predios", value=f"{resumen['total_predios']:,}")
+    with col2:
+        st.metric(label="Predios Afectados", value=f"{resumen['predios_afectados']:,}")
+    with col3:
+        st.metric(label="Área Total Predios", value=f"{resumen['area_total_ha']:,.2f} ha")
+    with col4:
+        st.metric(label="Área Afectada", value=f"{resumen['area_afectada_ha']:,.2f} ha")
+
+    st.markdown("---")
+    col_zonas, col_distribucion = st.columns([1, 1])
+
+    with col_zonas:
+        st.subheader("🌿 Afectación por Zona")
+        tabla_zonas = pd.DataFrame(resumen['por_zona']).rename(columns={
+            'ZONIFICACI': 'Zona', 'predios': 'Predios', 'hectareas': 'Hectáreas'
+        })
+        st.dataframe(tabla_zonas, width="stretch", hide_index=True,
+                     column_config={'Hectáreas': st.column_config.NumberColumn(format="%.2f")})
+
+    with col_distribucion:
+        st.subheader("📈 Distribución del Porcentaje Afectado")
+        distribucion = pd.DataFrame(resumen['distribucion']).set_index('rango')
+        st.bar_chart(distribucion, y='predios', x_label="Porcentaje del predio afectado", y_label="Predios")
+
+
+def tabla_zonas_afectadas(interseccion, normativa_zonas):
+    """
+    Tabla de detalle de las zonas que afectan al predio, con el área ya formateada
+    y las actividades como listas (ya separadas al cargar los datos).
+    """
+    interseccion_detallada = interseccion[['ZONIFICACI', 'DESCRIPCI', 'ACTO_ZONIF']].copy()
+    claves = [normativa.clave_zona(*textos) for textos in
+              interseccion[['DESCRIPCI', 'ACT_PERMIT', 'ACT_PROHIB']].itertuples(index=False)]
+    interseccion_detallada['ACT_PERMIT'] = [list(normativa_zonas[c]['permitidas']) for c in claves]
+    interseccion_detallada['ACT_PROHIB'] = [list(normativa_zonas[c]['prohibidas']) for c in claves]
+    interseccion_detallada['Área'] = formatear_area(interseccion['Area_m2'])
+    return interseccion_detallada
+
+
+# --- EXPORTACIÓN DE RESULTADOS ---
+
+# Las exportaciones de sesiones que ya terminaron se borran pasado este tiempo
+EDAD_MAXIMA_EXPORTACION_S = 24 * 3600
+
+
+def _directorio_exportaciones():
+    """
+    Directorio de las exportaciones dentro de la caché. Al usarlo se borran las
+    exportaciones con más de EDAD_MAXIMA_EXPORTACION_S segundos.
+    """
+    directorio = datos.ruta_cache("exportaciones")
+    os.makedirs(directorio, exist_ok=True)
+    limite = time.time() - EDAD_MAXIMA_EXPORTACION_S
+    for entrada in os.scandir(directorio):
+        try:
+            if entrada.stat().st_mtime < limite:
+                shutil.rmtree(entrada.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass  # La borró otra sesión
+    return directorio
+
+
+def preparar_exportacion(predios, zonas, chips, formato, clave):
+    """
+    Escribe por lotes (ver exportar.py) el predio y las zonas afectadas de cada CHIP
+    en cache/exportaciones y guarda su ruta en la sesión para ofrecer la descarga.
+    La exportación anterior de la misma clave se borra. Si ningún CHIP está en la capa
+    de predios no se escribe archivo, sea cual sea el formato.
+    """
+    anterior = st.session_state.pop(clave, None)
+    if anterior is not None and anterior['ruta'] is not None:
+        shutil.rmtree(os.path.dirname(anterior['ruta']), ignore_errors=True)
+
+    extension, _ = exportar.FORMATOS[formato]
+    directorio = tempfile.mkdtemp(prefix="exportacion_", dir=_directorio_exportaciones())
+    ruta = os.path.join(directorio, f"exportacion.{extension}")
+    if exportar.exportar(predios, zonas, chips, formato, ruta) == 0:
+        shutil.rmtree(directorio, ignore_errors=True)
+        ruta = None
+    st.session_state[clave] = {'ruta': ruta, 'formato': formato}
+
+
+def boton_descarga_exportacion(clave, nombre_archivo):
+    """
+    Muestra el botón de descarga de una exportación preparada con preparar_exportacion.
+    """
+    exportacion = st.session_state.get(clave)
+    if exportacion is None:
+        return
+    if exportacion['ruta'] is None:
+        st.warning("No hay geometrías para exportar con los CHIP indicados.")
+        return
+    if not os.path.exists(exportacion['ruta']):
+        st.info("La exportación expiró; vuelve a prepararla.")
+        return
+
+    extension, mime = exportar.FORMATOS[exportacion['formato']]
+    with open(exportacion['ruta'], "rb") as f:
+        st.download_button(
+            label=f"⬇️ Descargar {exportacion['formato']}",
+            data=f,
+            file_name=f"{nombre_archivo}.{extension}",
+            mime=mime,
+            key=f"descarga_{clave}"
+        )
+
+
+# --- CONSULTAS AGRUPADAS ENTRE SESIONES ---
+
+@st.cache_resource
+def vuelos():
+    """
+    Registro, compartido por todas las sesiones, de los cálculos en curso: las consultas
+    idénticas simultáneas esperan el cálculo de la primera (ver vuelo_unico.py).
+    Los resultados son compartidos y no se modifican.
+    """
+    return vuelo_unico.VueloUnico()
+
+
+def buscar_chip(predios, chip):
+    """
+    Devuelve el resultado de la consulta por CHIP.
+    """
+    # Uso de 'CHIP' para filtrar
+    consulta = predios[predios['CHIP'] == chip]
+
+    if len(consulta) > 0:
+        return {'tipo': 'chip', 'referencia': chip, 'consulta_gdf': consulta.copy()}
+
+    # CORREGIDO: Mensaje para predios no encontrados
+    return {
+        'tipo': 'no_afectado',
+        'mensaje': f"El predio consultado (CHIP: {chip}) no presenta afectación por la Reserva Forestal Protectora Bosque Oriental de Bogotá."
+    }
+
+
+def buscar_coordenadas(predios, zonas, x, y, distancia_cercanos, k_cercanos):
+    """
+    Devuelve el resultado de la consulta por coordenadas (EPSG:9377): el predio que
+    contiene el punto o, si no hay ninguno, los predios más cercanos.
+    """
+    punto = Point(x, y)
+
+    # Operación de intersección espacial (con el índice espacial)
+    consulta = predios.iloc[np.sort(predios.sindex.query(punto, predicate="intersects"))]
+
+    if len(consulta) > 0:
+        # Uso de 'CHIP' para obtener el identificador
+        return {'tipo': 'coordenadas', 'referencia': consulta.iloc[0]['CHIP'], 'consulta_gdf': consulta.copy()}
+
+    # El punto cae en una vía o entre predios: buscar los predios más cercanos
+    cercanos = consultas.predios_cercanos(predios, punto, distancia_cercanos, k_cercanos)
+    if len(cercanos) > 0:
+        return {
+            'tipo': 'cercanos',
+            'mensaje': f"Las coordenadas (X: {x}, Y: {y}) no caen dentro de ningún predio registrado. Estos son los predios más cercanos a menos de {distancia_cercanos:,.0f} m:",
+            'cercanos_gdf': cercanos,
+            'resumen': consultas.afectacion_cercanos(cercanos, zonas)
+        }
+
+    return {
+        'tipo': 'no_afectado',
+        'mensaje': f"Las coordenadas (X: {x}, Y: {y}) no caen dentro de ningún predio registrado y no hay predios a menos de {distancia_cercanos:,.0f} m."
+    }
+
+
+def calcular_interseccion(consulta, zonas):
+    """
+    Superposición del predio con la zonificación, con el área de cada pieza en Area_m2.
+    """
+    interseccion = gpd.overlay(consulta, zonas, how="intersection", keep_geom_type=False)
+    interseccion['Area_m2'] = interseccion.geometry.area
+    return interseccion
+
+
+# --- GENERACIÓN DE PDF MEJORADA ---
+
+# Calidad del mapa según el modo del reporte. La simplificación es una fracción de la
+# extensión del predio (o de la reserva, en el mini-mapa), del orden de un píxel a baja resolución.
+MODOS_REPORTE = {
+    "Borrador": {'dpi': 80, 'simplificacion': 0.002, 'formato': 'jpg', 'calidad_jpg': 75},
+    "Impresión": {'dpi': 200, 'simplificacion': 0.0, 'formato': 'png', 'calidad_jpg': None},
+}
+
+
+@st.cache_resource(show_spinner=False)
+def reserva_simplificada(huella, _reserva_gdf, tolerancia):
+    """
+    Límite de la reserva simplificado para el mini-mapa de los reportes en borrador.
+    """
+    return _reserva_gdf.set_geometry(_reserva_gdf.geometry.simplify(tolerancia))
+
+
+def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcentaje_afectado, reserva_gdf,
+                limites_predio, centroide_predio, limites_reserva, normativa_zonas, huella_zonas, version_datos,
+                archivo_pdf, modo_reporte="Impresión"):
+    """
+    Genera el reporte PDF del predio en archivo_pdf. Devuelve True si se generó.
+    huella_zonas es la versión de la zonificación (llave del límite simplificado de la reserva).
+    En modo "Borrador" el mapa se dibuja con geometrías simplificadas, a menor
+    resolución y en JPEG (ver MODOS_REPORTE).
+    """
+    config = MODOS_REPORTE[modo_reporte]
+    archivo_mapa = f"{archivo_pdf}.{config['formato']}"
 
     # === 1. Generar mapa estático optimizado ===
     try:
         # Calcular aspect ratio del predio para tamaño adaptativo
-        bounds = consulta.total_bounds
+        bounds = limites_predio
         width = bounds[2] - bounds[0]
         height = bounds[3] - bounds[1]
         aspect_ratio = width / height
+
+        # Geometrías simplificadas para el borrador
+        if config['simplificacion'] > 0:
+            tolerancia = config['simplificacion'] * max(width, height)
+            consulta = consulta.set_geometry(consulta.geometry.simplify(tolerancia))
+            interseccion = interseccion.set_geometry(interseccion.geometry.simplify(tolerancia))
+            tolerancia_reserva = config['simplificacion'] * max(limites_reserva[2] - limites_reserva[0],
+                                                                limites_reserva[3] - limites_reserva[1])
+            reserva_gdf = reserva_simplificada(huella_zonas, reserva_gdf, tolerancia_reserva)
         
         # Determinar tamaño de figura según aspect ratio
         if aspect_ratio > 1.5:  # Predio ancho
@@ -134,7 +622,7 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
             interseccion.plot(ax=ax_main, color=interseccion['color'], edgecolor='black', linewidth=0.5)
 
         # Ajustar límites con margen
-        minx, miny, maxx, maxy = consulta.total_bounds
+        minx, miny, maxx, maxy = limites_predio
         margin_x = (maxx - minx) * 0.1
         margin_y = (maxy - miny) * 0.1
         ax_main.set_xlim(minx - margin_x, maxx + margin_x)
@@ -161,12 +649,11 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
                         linewidth=1, alpha=0.3)
         
         # Dibujar predio como punto rojo
-        centroid = consulta.geometry.centroid.iloc[0]
-        ax_inset.plot(centroid.x, centroid.y, 'ro', markersize=8, markeredgecolor='darkred', 
+        ax_inset.plot(centroide_predio[0], centroide_predio[1], 'ro', markersize=8, markeredgecolor='darkred', 
                      markeredgewidth=1.5)
         
         # Ajustar límites al extent de la reserva
-        res_bounds = reserva_gdf.total_bounds
+        res_bounds = limites_reserva
         ax_inset.set_xlim(res_bounds[0], res_bounds[2])
         ax_inset.set_ylim(res_bounds[1], res_bounds[3])
         ax_inset.set_title('Ubicación en Reserva', fontsize=8)
@@ -195,12 +682,13 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
                       ha='center', va='bottom', fontsize=7, style='italic',
                       transform=ax_legend.transAxes)
 
-        plt.savefig(archivo_mapa, dpi=200, bbox_inches='tight', facecolor='white')
+        plt.savefig(archivo_mapa, dpi=config['dpi'], bbox_inches='tight', facecolor='white',
+                    pil_kwargs={'quality': config['calidad_jpg']} if config['calidad_jpg'] else None)
         plt.close(fig)
 
     except Exception as e:
         st.error(f"Error al generar el mapa: {e}")
-        return
+        return False
 
     # === 2. Clase PDF ===
     class PDF(FPDF):
@@ -213,7 +701,10 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
             self.set_font('Arial', '', 10)
             self.set_text_color(0, 0, 0)
             self.set_y(20)
-            self.cell(0, 5, f'Generado el: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', 0, 1, 'R')
+            # La fecha es la de generación; el reporte sigue vigente mientras no cambien la
+            # zonificación ni la geometría del predio (version_datos: "<zonas>-<predio>")
+            marca_borrador = ' | BORRADOR - sin validez oficial' if modo_reporte == "Borrador" else ''
+            self.cell(0, 5, f'Versión de datos: {version_datos} | Generado el: {generado_el}{marca_borrador}', 0, 1, 'R')
             self.ln(5)
 
         def footer(self):
@@ -221,6 +712,7 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
             self.set_font('Arial', 'I', 8)
             self.cell(0, 10, f'Página {self.page_no()}/{{nb}}', 0, 0, 'C')
 
+    generado_el = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     pdf = PDF()
     pdf.alias_nb_pages()
     pdf.add_page()
@@ -283,75 +775,145 @@ def generar_pdf(chip, consulta, interseccion, area_predio, area_afectada, porcen
         for row in interseccion.itertuples(index=False):
             pdf.set_fill_color(230, 230, 230)
             pdf.set_font('Arial', 'B', 10)
-            pdf.cell(0, 8, f"ZONA: {row.ZONIFICACI} (Afectación: {formatear_area(row.geometry.area, True)})", ln=True, fill=True)
+            pdf.cell(0, 8, f"ZONA: {row.ZONIFICACI} (Afectación: {formatear_area(row.Area_m2, True)})", ln=True, fill=True)
             
+            # Textos de la zona ya diagramados al cargar los datos (ver normativa.py)
+            normativa_zona = normativa_zonas[normativa.clave_zona(row.DESCRIPCI, row.ACT_PERMIT, row.ACT_PROHIB)]
+
             pdf.set_font('Arial', 'U', 9)
             pdf.cell(0, 6, "Descripción:", 0, 1)
-            pdf.set_font('Arial', '', 9)
-            pdf.multi_cell(0, 5, str(row.DESCRIPCI or ""), align='J')
+            normativa.escribir_bloque(pdf, normativa_zona['bloque_descripcion'])
 
             pdf.set_font('Arial', 'U', 9)
             pdf.cell(0, 6, "Actividades Permitidas:", 0, 1)
-            pdf.set_font('Arial', '', 9)
-            if isinstance(row.ACT_PERMIT, str):
-                for act in [a.strip() for a in row.ACT_PERMIT.split('.') if a.strip()]:
-                    pdf.cell(5)
-                    pdf.multi_cell(0, 4, f"- {act}", 0, 'J')
+            normativa.escribir_bloque(pdf, normativa_zona['bloque_permitidas'])
 
             pdf.set_font('Arial', 'U', 9)
             pdf.cell(0, 6, "Actividades Prohibidas:", 0, 1)
-            pdf.set_font('Arial', 'B', 9)
-            if isinstance(row.ACT_PROHIB, str):
-                for act in [a.strip() for a in row.ACT_PROHIB.split('.') if a.strip()]:
-                    pdf.cell(5)
-                    pdf.multi_cell(0, 4, f"- {act}", 0, 'J')
+            normativa.escribir_bloque(pdf, normativa_zona['bloque_prohibidas'])
 
             pdf.ln(3)
 
-    # === 6. Guardar y ofrecer descarga ===
-    archivo_pdf = f"reporte_{chip_limpio}.pdf"
+    # === 6. Guardar ===
     pdf.output(archivo_pdf)
 
-    with open(archivo_pdf, "rb") as f:
-        st.download_button(
-            label="⬇️ Descargar Reporte PDF",
-            data=f,
-            file_name=archivo_pdf,
-            mime="application/pdf"
-        )
-
-    # Esperar un momento antes de eliminar el archivo (solución para Windows)
-    import time
-    time.sleep(0.5)
-    
     # Intentar eliminar el archivo temporal de manera segura
     if os.path.exists(archivo_mapa):
         try:
             os.remove(archivo_mapa)
         except PermissionError:
-            # Si no se puede eliminar inmediatamente, programar eliminación
+            # Si no se puede eliminar inmediatamente (Windows), programar eliminación
             import atexit
             atexit.register(lambda: os.remove(archivo_mapa) if os.path.exists(archivo_mapa) else None)
 
+    return True
+
+
+def generar_reporte_en_cache(clave, chip, modo_reporte, huella_zonas, version_reporte, argumentos_pdf):
+    """
+    Genera el reporte y lo guarda en la caché en disco. Devuelve (ruta, segundos),
+    o (None, None) si no se pudo generar.
+    """
+    archivo_temporal = cache_reportes.ruta_temporal()
+    inicio = time.perf_counter()
+    try:
+        if not generar_pdf(chip, *argumentos_pdf, huella_zonas, version_reporte, archivo_temporal, modo_reporte):
+            return None, None
+        return cache_reportes.guardar(archivo_temporal, clave), time.perf_counter() - inicio
+    finally:
+        # Si generar_pdf falla o lanza una excepción quedan el PDF temporal y la imagen del mapa
+        # (guardar ya movió el PDF si todo salió bien)
+        for ruta in [archivo_temporal] + [f"{archivo_temporal}.{c['formato']}" for c in MODOS_REPORTE.values()]:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+
+def _abrir_reporte(archivo_pdf):
+    """
+    Abre un reporte de la caché, o devuelve None si no existe: otra sesión puede haberlo
+    desalojado entre cache_reportes.buscar y la apertura. Una vez abierto, el desalojo ya
+    no impide leerlo.
+    """
+    if archivo_pdf is None:
+        return None
+    try:
+        return open(archivo_pdf, "rb")
+    except FileNotFoundError:
+        return None
+
+
+def ofrecer_reporte_pdf(chip, huella_zonas, huella_predio, modo_reporte, *argumentos_pdf):
+    """
+    Sirve el reporte PDF desde la caché en disco (ver cache_reportes.py) o, si no existe
+    para este CHIP, geometría, versión de la zonificación, plantilla y modo, lo genera y
+    lo guarda. Luego ofrece la descarga junto con el tiempo de generación y el tamaño del
+    último reporte de cada modo.
+    """
+    clave = cache_reportes.clave_reporte(chip, huella_zonas, huella_predio, modo_reporte)
+    mediciones = st.session_state.setdefault('mediciones_reporte', {})
+
+    reporte = _abrir_reporte(cache_reportes.buscar(clave))
+    if reporte is None:
+        # Si otra sesión ya está generando este mismo reporte, se espera su resultado
+        archivo_pdf, segundos = vuelos().ejecutar(('pdf', clave), generar_reporte_en_cache,
+                                                  clave, chip, modo_reporte, huella_zonas,
+                                                  f"{huella_zonas}-{huella_predio[:16]}", argumentos_pdf)
+        reporte = _abrir_reporte(archivo_pdf)
+        if reporte is None:
+            # También lo ven las sesiones que esperaban el reporte generado por otra
+            st.error("No se pudo generar el reporte PDF de este predio. Intente de nuevo.")
+            return
+        mediciones[modo_reporte] = f"generado en {segundos:.2f} s"
+    else:
+        mediciones[modo_reporte] = "servido desde la caché"
+
+    chip_limpio = re.sub(r'[^\w]', '', chip)
+    sufijo = "_borrador" if modo_reporte == "Borrador" else ""
+    with reporte as f:
+        mediciones[modo_reporte] += f", {os.fstat(f.fileno()).st_size / 1024:,.0f} KB"
+        st.caption(" | ".join(f"{modo}: {medicion}" for modo, medicion in mediciones.items()))
+        st.download_button(
+            label="⬇️ Descargar Reporte PDF",
+            data=f,
+            file_name=f"reporte_{chip_limpio}{sufijo}.pdf",
+            mime="application/pdf"
+        )
+
 
 # --- CARGA INICIAL DE DATOS ---
-predios, zonas, reserva_gdf = cargar_datos()
+huella_datos = datos.huella_datos()
+# Las cachés que solo dependen de la zonificación, o de la zonificación y un predio,
+# se indexan con su versión para sobrevivir a una actualización de la capa de predios
+huella_zonas = datos.huella_zonas()
+predios, zonas, reserva_gdf = cargar_datos(huella_datos)
 
 if predios is None or zonas is None or reserva_gdf is None:
     st.stop() 
 
+geometria = cargar_geometria(huella_datos, predios, reserva_gdf)
+normativa_zonas = cargar_normativa(huella_zonas, zonas)
+
 
 # =========================================================================
 # === BARRA LATERAL (SIDEBAR) - LÓGICA DE ENTRADA ===
 # =========================================================================
 
 st.sidebar.header("🔎 Consulta GEOLandy")
-modo = st.sidebar.radio("Modo de búsqueda:", ["Por CHIP", "Por coordenadas"])
+vista = st.sidebar.radio("Vista:", ["Consulta de predios", "Estadísticas de la Reserva"], key="vista")
+
+if vista == "Estadísticas de la Reserva":
+    mostrar_estadisticas(cargar_estadisticas(huella_datos, predios, zonas))
+    st.stop()
+
+modo = st.sidebar.radio("Modo de búsqueda:", ["Por CHIP", "Por coordenadas", "Zonificación de un punto", "Área de interés"],
+                        key="modo")
 
 if modo == "Por CHIP":
-    chip = st.sidebar.text_input("Ingrese el código CHIP (Ej: AAA0143FTRS):")
+    chip = st.sidebar.text_input("Ingrese el código CHIP (Ej: AAA0143FTRS):", key="chip")
     
-    if st.sidebar.button("🔍 Buscar por CHIP"):
+    if st.sidebar.button("🔍 Buscar por CHIP", key="btn_buscar_chip"):
         if chip.strip() == "":
             st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': "Por favor, ingrese un código CHIP."}
             st.rerun()
@@ -362,26 +924,30 @@ if modo == "Por CHIP":
             st.rerun()
 
         try:
-            # Uso de 'CHIP' para filtrar
-            consulta = predios[predios['CHIP'] == chip]
-            
-            if len(consulta) > 0:
-                # Almacena la información
-                st.session_state.resultado_consulta = {
-                    'tipo': 'chip',
-                    'referencia': chip,
-                    'consulta_gdf': consulta.copy() 
-                }
-            else:
-                # CORREGIDO: Mensaje para predios no encontrados
-                st.session_state.resultado_consulta = {
-                    'tipo': 'no_afectado',
-                    'mensaje': f"El predio consultado (CHIP: {chip}) no presenta afectación por la Reserva Forestal Protectora Bosque Oriental de Bogotá."
-                }
+            # Las consultas simultáneas del mismo CHIP comparten un solo cálculo
+            # version_datos: las filas de consulta_gdf son de esta versión de la capa de predios
+            st.session_state.resultado_consulta = dict(
+                vuelos().ejecutar(('chip', huella_datos, chip), buscar_chip, predios, chip),
+                version_datos=huella_datos
+            )
                                 
         except Exception as e:
             st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error al buscar el CHIP: {e}"}
             
+    # Exportación de un lote de CHIPs
+    with st.sidebar.expander("📦 Exportar lote de CHIPs"):
+        texto_lote = st.text_area("CHIPs (uno por línea o separados por comas):", key="chips_lote")
+        formato_lote = st.selectbox("Formato:", list(exportar.FORMATOS), key="formato_lote")
+
+        if st.button("💾 Exportar Lote", key="btn_exportar_lote"):
+            chips_lote = [c for c in re.split(r"[\s,;]+", texto_lote) if c]
+            faltantes = set(chips_lote) - set(predios['CHIP'])
+            if faltantes:
+                st.info(f"{len(faltantes)} CHIP(s) no se encontraron y se omiten.")
+            preparar_exportacion(predios, zonas, chips_lote, formato_lote, "exportacion_lote")
+
+        boton_descarga_exportacion("exportacion_lote", "geolandy_lote")
+
     # Botón para limpiar si ya hay un resultado
     if st.session_state.resultado_consulta is not None:
         if st.sidebar.button("↩️ Limpiar Búsqueda"):
@@ -394,35 +960,114 @@ elif modo == "Por coordenadas":
     # Ejemplo para evitar errores de digitación
     st.sidebar.info("💡 **Ejemplo (EPSG:9377):**\n- X (Este): 4884290.02 \n- Y (Norte): 2065679.52")
     
-    x = st.sidebar.number_input("Coordenada X (Este):", value=5000000.0, format="%.2f")
-    y = st.sidebar.number_input("Coordenada Y (Norte):", value=2000000.0, format="%.2f") 
+    x = st.sidebar.number_input("Coordenada X (Este):", value=5000000.0, format="%.2f", key="coord_x")
+    y = st.sidebar.number_input("Coordenada Y (Norte):", value=2000000.0, format="%.2f", key="coord_y") 
+
+    # Búsqueda de respaldo cuando el punto no cae dentro de ningún predio
+    distancia_cercanos = st.sidebar.number_input("Distancia máxima a predios cercanos (m):", min_value=0.0,
+                                                 value=consultas.DISTANCIA_CERCANOS_M, step=10.0)
+    k_cercanos = st.sidebar.slider("Número de predios cercanos:", min_value=1, max_value=10,
+                                   value=consultas.K_CERCANOS)
     
-    if st.sidebar.button("🔍 Buscar por coordenadas"):
+    if st.sidebar.button("🔍 Buscar por coordenadas", key="btn_buscar_coord"):
         try:
-            # Crear un punto GeoDataFrame en EPSG:9377
-            punto = gpd.GeoDataFrame(geometry=[Point(x, y)], crs="EPSG:9377") 
-            
-            # Operación de intersección espacial 
-            consulta = predios[predios.intersects(punto.iloc[0].geometry)]
+            # Las consultas simultáneas de las mismas coordenadas comparten un solo cálculo
+            st.session_state.resultado_consulta = dict(vuelos().ejecutar(
+                ('coordenadas', huella_datos, x, y, distancia_cercanos, k_cercanos),
+                buscar_coordenadas, predios, zonas, x, y, distancia_cercanos, k_cercanos
+            ), version_datos=huella_datos)
+
+        except Exception as e:
+            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error al buscar por coordenadas: {e}"}
             
-            if len(consulta) > 0:
-                # Uso de 'CHIP' para obtener el identificador
-                predio_chip = consulta.iloc[0]['CHIP']
+    # Botón para limpiar si ya hay un resultado
+    if st.session_state.resultado_consulta is not None:
+        if st.sidebar.button("↩️ Limpiar Búsqueda"):
+            st.session_state.resultado_consulta = None
+            st.rerun()
+
+elif modo == "Zonificación de un punto":
+    st.sidebar.markdown("**Sistema de Referencia: EPSG:9377**")
+    st.sidebar.info("💡 Consulta la zonificación aplicable en cualquier punto, esté o no dentro de un predio registrado.")
+
+    x_zona = st.sidebar.number_input("Coordenada X (Este):", value=5000000.0, format="%.2f", key="zona_x")
+    y_zona = st.sidebar.number_input("Coordenada Y (Norte):", value=2000000.0, format="%.2f", key="zona_y")
+
+    if st.sidebar.button("🔍 Consultar zonificación", key="btn_buscar_zona"):
+        try:
+            zona = cargar_clasificador(huella_zonas, zonas).zona_en(x_zona, y_zona)
+
+            if zona is not None:
                 st.session_state.resultado_consulta = {
-                    'tipo': 'coordenadas',
-                    'referencia': predio_chip,
-                    'consulta_gdf': consulta.copy()
+                    'tipo': 'zona_punto',
+                    'referencia': f"X: {x_zona}, Y: {y_zona}",
+                    'zona': zona
                 }
             else:
-                # CORREGIDO: Mensaje para coordenadas no encontradas
                 st.session_state.resultado_consulta = {
                     'tipo': 'no_afectado',
-                    'mensaje': f"El predio consultado en las coordenadas (X: {x}, Y: {y}) no presenta afectación por la Reserva Forestal Protectora Bosque Oriental de Bogotá."
+                    'mensaje': f"Las coordenadas (X: {x_zona}, Y: {y_zona}) están fuera de la zonificación de la Reserva Forestal Protectora Bosque Oriental de Bogotá."
                 }
 
         except Exception as e:
-            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error al buscar por coordenadas: {e}"}
-            
+            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error al consultar la zonificación: {e}"}
+
+    # Botón para limpiar si ya hay un resultado
+    if st.session_state.resultado_consulta is not None:
+        if st.sidebar.button("↩️ Limpiar Búsqueda"):
+            st.session_state.resultado_consulta = None
+            st.rerun()
+
+elif modo == "Área de interés":
+    forma = st.sidebar.radio("Definir el área:", ["Radio alrededor de un punto", "Polígono dibujado"], key="area_forma")
+    area = None
+
+    if forma == "Radio alrededor de un punto":
+        st.sidebar.markdown("**Sistema de Referencia: EPSG:9377**")
+        x_area = st.sidebar.number_input("Coordenada X (Este):", value=5000000.0, format="%.2f", key="area_x")
+        y_area = st.sidebar.number_input("Coordenada Y (Norte):", value=2000000.0, format="%.2f", key="area_y")
+        radio_area = st.sidebar.number_input("Radio (m):", min_value=1.0, value=consultas.RADIO_AREA_M,
+                                             step=50.0, key="area_radio")
+        area = Point(x_area, y_area).buffer(radio_area)
+        descripcion_area = f"a menos de {radio_area:,.0f} m de (X: {x_area}, Y: {y_area})"
+    else:
+        st.sidebar.info("💡 Dibuje un polígono o un rectángulo sobre el mapa y luego presione Buscar.")
+        with st.sidebar:
+            dibujo = st_folium(mapa_dibujo(huella_zonas, reserva_gdf, tuple(geometria['limites_reserva_wgs84'].tolist())),
+                               height=300, key="mapa_dibujo", returned_objects=["last_active_drawing"])
+        figura = (dibujo or {}).get("last_active_drawing")
+        if figura:
+            area = gpd.GeoSeries([shape(figura['geometry'])], crs="EPSG:4326").to_crs(epsg=datos.EPSG_TRABAJO).iloc[0]
+        descripcion_area = "dentro del polígono dibujado"
+
+    if st.sidebar.button("🔍 Buscar en el área", key="btn_buscar_area"):
+        if area is None:
+            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': "Dibuje un polígono sobre el mapa antes de buscar."}
+            st.rerun()
+
+        try:
+            # Una sola consulta al índice espacial y una sola superposición para todos los predios
+            en_area = consultas.predios_en_area(predios, area)
+
+            if len(en_area) > 0:
+                tabla_area, agregados_area = consultas.afectacion_area(en_area, zonas)
+                st.session_state.resultado_consulta = {
+                    'tipo': 'area',
+                    'referencia': descripcion_area,
+                    'area': area,
+                    'en_area_gdf': en_area,
+                    'tabla': tabla_area,
+                    'agregados': agregados_area
+                }
+            else:
+                st.session_state.resultado_consulta = {
+                    'tipo': 'no_afectado',
+                    'mensaje': f"No hay predios registrados {descripcion_area}."
+                }
+
+        except Exception as e:
+            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error al buscar en el área de interés: {e}"}
+
     # Botón para limpiar si ya hay un resultado
     if st.session_state.resultado_consulta is not None:
         if st.sidebar.button("↩️ Limpiar Búsqueda"):
@@ -439,197 +1084,279 @@ st.markdown("Aplicación para determinar la afectación por zonificación de la
 
 st.markdown("---")
 
+# Perfilado opcional de la ejecución que muestra el resultado (ver perfilador.py)
+perfil = None
 if st.session_state.resultado_consulta is not None:
-    resultado = st.session_state.resultado_consulta
+    perfil = perfilador.iniciar(st.session_state.resultado_consulta.get('referencia', 'consulta'))
 
-    if resultado['tipo'] == 'error':
-        st.error(f"❌ Error en la consulta: {resultado['mensaje']}")
+# Un st.rerun() o st.stop() en la vista interrumpe la ejecución: el finally asegura que
+# el perfilador siempre se detenga (y libere el perfilador del proceso en Python 3.12+)
+ruta_perfil = None
+try:
+    if st.session_state.resultado_consulta is not None:
+        resultado = st.session_state.resultado_consulta
+
+        if resultado['tipo'] == 'error':
+            st.error(f"❌ Error en la consulta: {resultado['mensaje']}")
     
-    elif resultado['tipo'] == 'no_afectado':
-        # NUEVO: Manejo de predios no afectados
-        st.success("✅ Consulta realizada exitosamente")
-        st.info(f"ℹ️ {resultado['mensaje']}")
+        elif resultado['tipo'] == 'no_afectado':
+            # NUEVO: Manejo de predios no afectados
+            st.success("✅ Consulta realizada exitosamente")
+            st.info(f"ℹ️ {resultado['mensaje']}")
         
-        st.markdown("---")
-        if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta_na"):
-            st.session_state.resultado_consulta = None 
-            st.rerun()
+            st.markdown("---")
+            if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta_na"):
+                st.session_state.resultado_consulta = None 
+                st.rerun()
         
-    else:
-        # Se encontró un predio, procesar y mostrar resultados
-        try:
-            consulta = resultado['consulta_gdf']
-            referencia = resultado['referencia'] # Contiene el CHIP
+        elif resultado['tipo'] == 'zona_punto':
+            # Zonificación de un punto arbitrario
+            zona = resultado['zona']
+            st.success(f"✅ Las coordenadas ({resultado['referencia']}) están en la **{zona['ZONIFICACI']}**")
+            st.markdown(f"**Norma:** {zona['ACTO_ZONIF']}")
+
+            with st.expander("Ver descripción y actividades de la zona", expanded=True):
+                st.markdown(f"**Descripción:** {zona['DESCRIPCI'] or ''}")
+                normativa_zona = normativa_zonas[normativa.clave_zona(zona['DESCRIPCI'], zona['ACT_PERMIT'], zona['ACT_PROHIB'])]
+                st.markdown("**Actividades Permitidas:**\n" + "".join(f"\n- {a}" for a in normativa_zona['permitidas']))
+                st.markdown("**Actividades Prohibidas:**\n" + "".join(f"\n- {a}" for a in normativa_zona['prohibidas']))
+
+            st.markdown("---")
+            if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta_zona"):
+                st.session_state.resultado_consulta = None
+                st.rerun()
+
+        elif resultado['tipo'] == 'cercanos':
+            # Punto fuera de todos los predios: ofrecer los predios más cercanos
+            st.warning(f"⚠️ {resultado['mensaje']}")
+
+            tabla_cercanos = resultado['resumen'].rename(columns={
+                'DISTANCIA_M': 'Distancia (m)', 'PORCENTAJE': 'Afectación (%)', 'ZONAS': 'Zonas'
+            })
+            st.dataframe(tabla_cercanos, width="stretch", hide_index=True,
+                         column_config={'Distancia (m)': st.column_config.NumberColumn(format="%.2f"),
+                                        'Afectación (%)': st.column_config.NumberColumn(format="%.2f")})
+
+            chip_cercano = st.selectbox("Consultar el predio:", resultado['resumen']['CHIP'].tolist())
+            if st.button("🔍 Ver detalle del predio", key="btn_ver_cercano"):
+                cercanos = resultado['cercanos_gdf']
+                st.session_state.resultado_consulta = {
+                    'tipo': 'coordenadas',
+                    'referencia': chip_cercano,
+                    'consulta_gdf': cercanos[cercanos['CHIP'] == chip_cercano].drop(columns=['DISTANCIA_M']),
+                    'version_datos': resultado.get('version_datos')
+                }
+                st.rerun()
+
+            st.markdown("---")
+            if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta_cercanos"):
+                st.session_state.resultado_consulta = None
+                st.rerun()
+
+        elif resultado['tipo'] == 'area':
+            # Todos los predios de un área de interés
+            tabla_area = resultado['tabla']
+            agregados_area = resultado['agregados']
+            st.success(f"✅ {agregados_area['total_predios']:,} predios {resultado['referencia']} | "
+                       f"Afectados: **{agregados_area['predios_afectados']:,}**")
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric(label="Predios", value=f"{agregados_area['total_predios']:,}")
+            with col2:
+                st.metric(label="Predios Afectados", value=f"{agregados_area['predios_afectados']:,}")
+            with col3:
+                st.metric(label="Área Total Predios", value=formatear_area(agregados_area['area_total_ha'] * 10000))
+            with col4:
+                st.metric(label="Área Afectada", value=formatear_area(agregados_area['area_afectada_ha'] * 10000))
+
+            col_mapa_area, col_zonas_area = st.columns([2, 1])
+            with col_mapa_area:
+                st.subheader("🗺️ Predios en el Área de Interés")
+                html_area, completo = mapa_area(huella_datos, resultado['area'].wkb_hex, resultado['area'],
+                                                resultado['en_area_gdf'], tabla_area)
+                components.html(html_area, height=500)
+                if not completo:
+                    st.caption(f"El área tiene más de {MAXIMO_PREDIOS_MAPA:,} predios; el mapa solo muestra su contorno.")
+
+            with col_zonas_area:
+                st.subheader("🌿 Afectación por Zona")
+                tabla_zonas = pd.DataFrame(agregados_area['por_zona']).rename(columns={
+                    'ZONIFICACI': 'Zona', 'predios': 'Predios', 'hectareas': 'Hectáreas'
+                })
+                st.dataframe(tabla_zonas, width="stretch", hide_index=True,
+                             column_config={'Hectáreas': st.column_config.NumberColumn(format="%.2f")})
+
+            st.subheader("📋 Afectación por Predio (m²)")
+            tabla_predios_area = tabla_area.rename(columns={
+                'AREA_PREDIO': 'Área Predio', 'AREA_EN_AREA': 'Área Dentro del Área', 'AREA_AFECTADA': 'Área Afectada',
+                'PORCENTAJE': 'Afectación (%)', 'ZONAS': 'Zonas'
+            })
+            st.dataframe(tabla_predios_area, width="stretch", hide_index=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.2f")
+                                        for c in tabla_predios_area.columns if c not in ('CHIP', 'Zonas')})
+
+            col_ver, col_exportar = st.columns(2)
+            with col_ver:
+                chip_area = st.selectbox("Consultar el predio:", tabla_area['CHIP'].tolist(), key="chip_area")
+                if st.button("🔍 Ver detalle del predio", key="btn_ver_predio_area"):
+                    st.session_state.resultado_consulta = {
+                        'tipo': 'chip',
+                        'referencia': chip_area,
+                        'consulta_gdf': predios[predios['CHIP'] == chip_area].copy(),
+                        'version_datos': huella_datos
+                    }
+                    st.rerun()
+
+            with col_exportar:
+                formato_area = st.selectbox("Formato de exportación:", list(exportar.FORMATOS), key="formato_area")
+                if st.button("💾 Exportar Predios del Área", key="btn_exportar_area"):
+                    preparar_exportacion(predios, zonas, tabla_area['CHIP'].tolist(), formato_area, "exportacion_area")
+                boton_descarga_exportacion("exportacion_area", "geolandy_area")
+
+            st.markdown("---")
+            if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta_area"):
+                st.session_state.resultado_consulta = None
+                st.rerun()
+
+        else:
+            # Se encontró un predio, procesar y mostrar resultados
+            try:
+                consulta = resultado['consulta_gdf']
+                referencia = resultado['referencia'] # Contiene el CHIP
             
-            # --- CÁLCULOS DE INTERSECCIÓN Y ÁREAS ---
+                # --- CÁLCULOS DE INTERSECCIÓN Y ÁREAS ---
             
-            interseccion = gpd.overlay(consulta, zonas, how="intersection", keep_geom_type=False)
-            area_predio = consulta.iloc[0].geometry.area
+                # Áreas, límites y centroides precalculados al cargar los datos. Si el resultado es
+                # de otra versión de la capa (se actualizó después de la consulta), sus filas ya no
+                # corresponden a las de los arreglos y se calculan a partir de su propia geometría
+                posiciones = predios.index.get_indexer(consulta.index)
+                if resultado.get('version_datos') == huella_datos and (posiciones >= 0).all():
+                    geometria_predio = {clave: geometria[clave][posiciones] for clave in
+                                        ('area', 'limites', 'limites_wgs84', 'centroide', 'centroide_wgs84')}
+                else:
+                    geometria_predio = datos.precalcular_geometria(consulta, reserva_gdf)
+                # Misma huella que el manifiesto de actualizar_datos.py: no cambia si el predio no cambia
+                huella_predio = datos.combinar_huellas(datos.huellas_geometrias(consulta.geometry.values))
+
+                # Las sesiones que muestran el mismo predio a la vez comparten la superposición
+                interseccion = vuelos().ejecutar(('interseccion', huella_zonas, huella_predio),
+                                                 calcular_interseccion, consulta, zonas)
+                area_predio = geometria_predio['area'][0]
             
             
-            if not interseccion.empty:
-                # Predio Afectado
-                area_afectada = interseccion.geometry.area.sum()  # CORREGIDO: sum() en lugar de union_all().area
-                area_no_afectada = area_predio - area_afectada
-                porcentaje_afectado = (area_afectada / area_predio) * 100
-                porcentaje_no_afectado = 100 - porcentaje_afectado
-                
-                # --- VISUALIZACIÓN DE RESULTADOS (Interfaz Mejorada) ---
+                if not interseccion.empty:
+                    # Predio Afectado
+                    area_afectada = interseccion['Area_m2'].sum()  # CORREGIDO: sum() en lugar de union_all().area
+                    area_no_afectada = area_predio - area_afectada
+                    porcentaje_afectado = (area_afectada / area_predio) * 100
+                    porcentaje_no_afectado = 100 - porcentaje_afectado
                 
-                st.success(f"✅ Predio encontrado. CHIP: **{referencia}** | Afectación Total: **{porcentaje_afectado:.2f}%**")
+                    # --- VISUALIZACIÓN DE RESULTADOS (Interfaz Mejorada) ---
                 
-                # 1. FILA DE MAPAS
-                col_mapa_general, col_mapa_detalle = st.columns([1, 2]) 
-
-                # 2. Generación de los Mapas Folium
-                consulta_wgs = consulta.to_crs(epsg=4326)
-                interseccion_wgs = interseccion.to_crs(epsg=4326)
-                reserva_wgs = reserva_gdf.to_crs(epsg=4326)
-                centroid = consulta_wgs.geometry.iloc[0].centroid
+                    st.success(f"✅ Predio encontrado. CHIP: **{referencia}** | Afectación Total: **{porcentaje_afectado:.2f}%**")
                 
-                # Calcular bounds
-                bounds_predio = consulta_wgs.total_bounds
-                bounds_reserva = reserva_wgs.total_bounds
-                
-                # MAPA 1: UBICACIÓN GENERAL (Contexto de la Reserva)
-                with col_mapa_general:
-                    st.subheader("🗺️ Ubicación General")
-                    mapa_general = folium.Map(
-                        location=[(bounds_reserva[1] + bounds_reserva[3])/2, 
-                                 (bounds_reserva[0] + bounds_reserva[2])/2],
-                        zoom_start=11
-                    )
-                    
-                    # Añadir límite de la reserva
-                    folium.GeoJson(
-                        reserva_wgs.to_json(),
-                        style_function=lambda x: {'fillColor': 'lightgreen', 
-                                                 'color': 'darkgreen', 
-                                                 'weight': 2,
-                                                 'fillOpacity': 0.2},
-                        tooltip=folium.Tooltip("Reserva Forestal Protectora")
-                    ).add_to(mapa_general)
-                    
-                    # Añadir predio
-                    folium.GeoJson(
-                        consulta_wgs.to_json(),
-                        style_function=lambda x: {'fillColor': 'blue', 
-                                                 'color': 'darkblue', 
-                                                 'weight': 3,
-                                                 'fillOpacity': 0.6},
-                        tooltip=folium.Tooltip(f"Predio: {referencia}")
-                    ).add_to(mapa_general)
-                    
-                    # Ajustar vista a la reserva
-                    mapa_general.fit_bounds([
-                        [bounds_reserva[1], bounds_reserva[0]], 
-                        [bounds_reserva[3], bounds_reserva[2]]
-                    ])
-                    
-                    st_folium(mapa_general, height=500, key="mapa_general")
+                    # La tabla de detalle se prepara en el pool mientras se construyen los mapas
+                    futuro_tabla = pool_hilos().submit(tabla_zonas_afectadas, interseccion, normativa_zonas)
 
+                    # 1. FILA DE MAPAS
+                    col_mapa_general, col_mapa_detalle = st.columns([1, 2]) 
 
-                # MAPA 2: MAPA DETALLADO DE AFECTACIÓN (Ajuste automático)
-                with col_mapa_detalle:
-                    st.subheader("🌿 Detalle de Afectación")
-                    mapa_detalle = folium.Map(
-                        location=[centroid.y, centroid.x],
-                        zoom_start=15
-                    ) 
-                    
-                    # Añadir límite del predio
-                    folium.GeoJson(
-                        consulta_wgs.to_json(),
-                        style_function=lambda x: {'fillColor': 'none', 
-                                                 'color': 'blue', 
-                                                 'weight': 3, 
-                                                 'fillOpacity': 0.1},
-                        tooltip=folium.Tooltip(f"Predio: {referencia}")
-                    ).add_to(mapa_detalle)
-                    
-                    # Añadir zonas de afectación
-                    folium.GeoJson(
-                        interseccion_wgs.to_json(),
-                        style_function=lambda x: {
-                            'fillColor': COLORES_CATEGORIA.get(x['properties']['ZONIFICACI'], '#808080'),
-                            'color': 'black',
-                            'weight': 1,
-                            'fillOpacity': 0.7
-                        },
-                        tooltip=folium.GeoJsonTooltip(
-                            fields=['ZONIFICACI', 'ACTO_ZONIF'], 
-                            aliases=['Zona:', 'Norma:']
-                        )
-                    ).add_to(mapa_detalle)
-                    
-                    # CORREGIDO: Ajustar vista automáticamente al predio
-                    mapa_detalle.fit_bounds([
-                        [bounds_predio[1], bounds_predio[0]], 
-                        [bounds_predio[3], bounds_predio[2]]
-                    ])
-                    
-                    st_folium(mapa_detalle, height=500, key="mapa_afectacion")
+                    # 2. Mapas Folium (HTML en caché por geometría del predio y versión de la zonificación)
+                    html_general, html_detalle = mapas_predio(
+                        huella_zonas, huella_predio, referencia, consulta, interseccion, reserva_gdf,
+                        tuple(geometria['limites_reserva_wgs84'].tolist()),
+                        tuple(geometria_predio['centroide_wgs84'][0].tolist()),
+                        tuple(datos.limites_conjuntos(geometria_predio['limites_wgs84']).tolist())
+                    )
+                
+                    # MAPA 1: UBICACIÓN GENERAL (Contexto de la Reserva)
+                    with col_mapa_general:
+                        st.subheader("🗺️ Ubicación General")
+                        components.html(html_general, height=500)
 
-                # 3. FILA DE RESUMEN Y DETALLE (Debajo de los mapas)
-                st.markdown("---")
-                col_resumen, col_detalle = st.columns([1, 2])
+                    # MAPA 2: MAPA DETALLADO DE AFECTACIÓN (Ajuste automático)
+                    with col_mapa_detalle:
+                        st.subheader("🌿 Detalle de Afectación")
+                        components.html(html_detalle, height=500)
+
+                    # 3. FILA DE RESUMEN Y DETALLE (Debajo de los mapas)
+                    st.markdown("---")
+                    col_resumen, col_detalle = st.columns([1, 2])
                 
-                with col_resumen:
-                    st.subheader("📊 Resumen de Áreas")
+                    with col_resumen:
+                        st.subheader("📊 Resumen de Áreas")
                     
-                    # CORREGIDO: Métricas sin valores negativos
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric(label="Área Total Predio", value=formatear_area(area_predio))
-                    with col2:
-                        st.metric(
-                            label="Área No Afectada", 
-                            value=formatear_area(area_no_afectada), 
-                            delta=f"{porcentaje_no_afectado:.2f}%"
-                        )
+                        # CORREGIDO: Métricas sin valores negativos
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric(label="Área Total Predio", value=formatear_area(area_predio))
+                        with col2:
+                            st.metric(
+                                label="Área No Afectada", 
+                                value=formatear_area(area_no_afectada), 
+                                delta=f"{porcentaje_no_afectado:.2f}%"
+                            )
                         
-                        st.metric(
-                            label="Área Afectada por Reserva", 
-                            value=formatear_area(area_afectada), 
-                            delta=f"{porcentaje_afectado:.2f}%", 
-                            delta_color="inverse"
-                        )
+                            st.metric(
+                                label="Área Afectada por Reserva", 
+                                value=formatear_area(area_afectada), 
+                                delta=f"{porcentaje_afectado:.2f}%", 
+                                delta_color="inverse"
+                            )
                     
-                    st.subheader("🛠️ Acciones")
+                        st.subheader("🛠️ Acciones")
 
-                    # Botón para el PDF
-                    if st.button("📄 Generar Reporte PDF", key="btn_pdf"):
-                        # Preparar datos para el PDF con colores
-                        interseccion_pdf = interseccion.copy()
-                        interseccion_pdf["color"] = interseccion_pdf["ZONIFICACI"].map(COLORES_CATEGORIA).fillna("#808080")
+                        # Botón para el PDF (el borrador es más rápido; la impresión es para documentos oficiales)
+                        modo_reporte = st.radio("Calidad del reporte:", list(MODOS_REPORTE), index=1,
+                                                horizontal=True, key="modo_reporte")
+                        if st.button("📄 Generar Reporte PDF", key="btn_pdf"):
+                            # Preparar datos para el PDF con colores
+                            interseccion_pdf = interseccion.copy()
+                            interseccion_pdf["color"] = interseccion_pdf["ZONIFICACI"].astype(str).map(COLORES_CATEGORIA).fillna("#808080")
                         
-                        generar_pdf(referencia, consulta, interseccion_pdf, 
-                                  area_predio, area_afectada, porcentaje_afectado, 
-                                  reserva_gdf)
+                            ofrecer_reporte_pdf(referencia, huella_zonas, huella_predio, modo_reporte, consulta, interseccion_pdf, 
+                                      area_predio, area_afectada, porcentaje_afectado, 
+                                      reserva_gdf,
+                                      datos.limites_conjuntos(geometria_predio['limites']),
+                                      geometria_predio['centroide'][0],
+                                      geometria['limites_reserva'],
+                                      normativa_zonas)
+
+                        # Exportación del predio y sus zonas afectadas
+                        formato_exportacion = st.selectbox("Formato de exportación:", list(exportar.FORMATOS),
+                                                           key="formato_exportacion")
+                        if st.button("💾 Exportar Resultado", key="btn_exportar"):
+                            preparar_exportacion(predios, zonas, [referencia], formato_exportacion,
+                                                 f"exportacion_{referencia}")
+                        boton_descarga_exportacion(f"exportacion_{referencia}", f"geolandy_{referencia}")
 
-                with col_detalle:
-                    st.subheader("🔍 Detalle de Zonificación Afectada")
+                    with col_detalle:
+                        st.subheader("🔍 Detalle de Zonificación Afectada")
                     
-                    # Expander para detalles de la tabla
-                    with st.expander("Ver Tabla Completa de Zonas Afectadas"):
-                        interseccion['Area_m2'] = interseccion.geometry.area
-                        interseccion_detallada = interseccion[['ZONIFICACI', 'DESCRIPCI', 'ACTO_ZONIF', 'ACT_PERMIT', 'ACT_PROHIB', 'Area_m2']].copy()
-                        interseccion_detallada['Área'] = interseccion_detallada['Area_m2'].apply(formatear_area)
-                        interseccion_detallada.drop(columns=['Area_m2'], inplace=True)
-                        st.dataframe(interseccion_detallada, width="stretch", hide_index=True)
+                        # Expander para detalles de la tabla
+                        with st.expander("Ver Tabla Completa de Zonas Afectadas"):
+                            st.dataframe(futuro_tabla.result(), width="stretch", hide_index=True)
                 
-            # Si NO hay afectación
-            else:
-                st.success(f"✅ Predio encontrado. CHIP: **{referencia}**")
-                st.info("ℹ️ **El predio no presenta afectación.** No intersecta con la zonificación de la Reserva Forestal Protectora.")
-                st.metric(label="Área Total Predio", value=formatear_area(area_predio))
+                # Si NO hay afectación
+                else:
+                    st.success(f"✅ Predio encontrado. CHIP: **{referencia}**")
+                    st.info("ℹ️ **El predio no presenta afectación.** No intersecta con la zonificación de la Reserva Forestal Protectora.")
+                    st.metric(label="Área Total Predio", value=formatear_area(area_predio))
                 
-            st.markdown("---")
-            if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta"):
-                st.session_state.resultado_consulta = None 
-                st.rerun() 
+                st.markdown("---")
+                if st.button("↩️ **Iniciar Nueva Consulta**", key="btn_nueva_consulta"):
+                    st.session_state.resultado_consulta = None 
+                    st.rerun() 
                 
-        except Exception as e:
-            st.error(f"Error desconocido durante el procesamiento de resultados. Intente de nuevo: {e}")
-            st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error en el procesamiento: {e}"}
-            st.rerun()
\ No newline at end of file
+            except Exception as e:
+                st.error(f"Error desconocido durante el procesamiento de resultados. Intente de nuevo: {e}")
+                st.session_state.resultado_consulta = {'tipo': 'error', 'mensaje': f"Error en el procesamiento: {e}"}
+                st.rerun()
+finally:
+    if perfil is not None:
+        ruta_perfil = perfil.guardar()
+
+# --- PERFILADO (OPCIONAL) ---
+if ruta_perfil is not None:
+    st.caption(f"⏱️ Perfil de esta ejecución guardado en {ruta_perfil}")
@@ -0,0 +1,128 @@
+"""
+Módulo normativa.py - Textos normativos de la zonificación, procesados una sola vez.
+
+La descripción y las actividades permitidas y prohibidas de cada zona no cambian de un
+predio a otro. Al cargar los datos se separan las actividades en listas y se diagraman
+los bloques de texto del reporte PDF (cortes de línea con get_string_width y espaciado
+de palabras para justificar), de modo que generar un reporte solo escribe líneas ya
+calculadas en lugar de volver a partir y justificar los textos con multi_cell.
+"""
+
+from fpdf import FPDF
+
+# Tipografía de cada bloque del reporte: (estilo, tamaño, alto de línea, sangría en mm)
+FORMATO_DESCRIPCION = ("", 9, 5, 0)
+FORMATO_PERMITIDAS = ("", 9, 4, 5)
+FORMATO_PROHIBIDAS = ("B", 9, 4, 5)
+FUENTE = "Arial"
+
+
+def separar_actividades(texto):
+    """
+    Separa un texto de actividades en frases (una por actividad, separadas por '.').
+    """
+    if not isinstance(texto, str):
+        return ()
+    return tuple(a.strip() for a in texto.split('.') if a.strip())
+
+
+def clave_zona(descripcion, permitidas, prohibidas):
+    """
+    Llave de la normativa de una zona: sus tres textos (las filas de la superposición
+    conservan los textos de la zona, así que se encuentran con la misma llave).
+    """
+    return tuple(t if isinstance(t, str) else "" for t in (descripcion, permitidas, prohibidas))
+
+
+def _partir_lineas(pdf, texto, ancho_max):
+    """
+    Parte un párrafo en líneas de a lo sumo ancho_max mm con la fuente actual de pdf.
+    """
+    lineas, actual = [], ""
+    for palabra in texto.split():
+        # Palabras más largas que una línea se cortan por caracteres, como hace multi_cell
+        while pdf.get_string_width(palabra) > ancho_max:
+            corte = len(palabra) - 1
+            while corte > 1 and pdf.get_string_width(palabra[:corte]) > ancho_max:
+                corte -= 1
+            if actual:
+                lineas.append(actual)
+                actual = ""
+            lineas.append(palabra[:corte])
+            palabra = palabra[corte:]
+
+        candidata = f"{actual} {palabra}" if actual else palabra
+        if actual and pdf.get_string_width(candidata) > ancho_max:
+            lineas.append(actual)
+            actual = palabra
+        else:
+            actual = candidata
+    if actual:
+        lineas.append(actual)
+    return lineas
+
+
+def diagramar(pdf, parrafos, formato):
+    """
+    Diagrama párrafos justificados. Devuelve el bloque: formato, ancho de celda y una
+    lista de (línea, espaciado entre palabras en mm); la última línea de cada párrafo
+    no se justifica.
+    """
+    estilo, tamano, _, sangria = formato
+    pdf.set_font(FUENTE, estilo, tamano)
+    ancho = pdf.w - pdf.l_margin - pdf.r_margin - sangria
+    ancho_max = ancho - 2 * pdf.c_margin
+
+    lineas = []
+    for parrafo in parrafos:
+        partes = _partir_lineas(pdf, parrafo, ancho_max) or [""]
+        for i, linea in enumerate(partes):
+            espacios = linea.count(" ")
+            ultima = i == len(partes) - 1
+            espaciado = 0.0 if ultima or espacios == 0 else (ancho_max - pdf.get_string_width(linea)) / espacios
+            lineas.append((linea, espaciado))
+    return {'formato': formato, 'ancho': ancho, 'lineas': tuple(lineas)}
+
+
+def escribir_bloque(pdf, bloque):
+    """
+    Escribe en pdf un bloque ya diagramado, desde la posición vertical actual.
+    """
+    estilo, tamano, alto, sangria = bloque['formato']
+    pdf.set_font(FUENTE, estilo, tamano)
+    for linea, espaciado in bloque['lineas']:
+        pdf.set_x(pdf.l_margin + sangria)
+        if espaciado > 0:
+            # Mismo mecanismo de justificación que multi_cell (operador Tw de PDF). ws y _out
+            # son internos de PyFPDF 1.7.2, la versión fijada en requirements.txt; fpdf2 no los tiene
+            pdf.ws = espaciado
+            pdf._out('%.3f Tw' % (espaciado * pdf.k))
+        pdf.cell(bloque['ancho'], alto, linea, 0, 1, 'L')
+        if espaciado > 0:
+            pdf.ws = 0
+            pdf._out('0 Tw')
+
+
+def compilar(zonas):
+    """
+    Procesa una vez los textos de todas las zonas. Devuelve un diccionario
+    clave_zona -> {'permitidas', 'prohibidas' (tuplas de actividades) y los bloques
+    diagramados 'bloque_descripcion', 'bloque_permitidas' y 'bloque_prohibidas'}.
+    """
+    pdf = FPDF()
+    normativa = {}
+    for descripcion, permitidas, prohibidas in zonas[["DESCRIPCI", "ACT_PERMIT", "ACT_PROHIB"]].itertuples(index=False):
+        clave = clave_zona(descripcion, permitidas, prohibidas)
+        if clave in normativa:
+            continue
+
+        actividades_permitidas = separar_actividades(permitidas)
+        actividades_prohibidas = separar_actividades(prohibidas)
+        normativa[clave] = {
+            'permitidas': actividades_permitidas,
+            'prohibidas': actividades_prohibidas,
+            'bloque_descripcion': diagramar(pdf, clave[0].splitlines() or [""], FORMATO_DESCRIPCION),
+            'bloque_permitidas': diagramar(pdf, [f"- {a}" for a in actividades_permitidas], FORMATO_PERMITIDAS),
+            'bloque_prohibidas': diagramar(pdf, [f"- {a}" for a in actividades_prohibidas], FORMATO_PROHIBIDAS),
+        }
+    return normativa
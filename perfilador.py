@@ -0,0 +1,90 @@
+"""
+Módulo perfilador.py - Perfilado opcional de la vista de resultados.
+
+Se activa solo en el servidor, con la variable de entorno GEOLANDY_PERFIL=1 (no desde
+la URL, para que un visitante no pueda llenar el disco). La ejecución del script que
+muestra un resultado se perfila con cProfile y el perfil se guarda en
+perfiles/<CHIP>_<fecha>.prof, listo para abrirlo con `python -m pstats` o snakeviz; se
+conservan los MAXIMO_PERFILES más recientes. Si no está activo, el costo es una
+consulta a un diccionario por ejecución.
+
+cProfile solo mide el hilo del script: el trabajo que se hace en el pool de hilos
+aparece como espera en Future.result.
+"""
+
+import cProfile
+import os
+import re
+from datetime import datetime
+
+import datos
+
+DIRECTORIO_PERFILES = os.environ.get("GEOLANDY_PERFILES", os.path.join(datos.DIRECTORIO_BASE, "perfiles"))
+MAXIMO_PERFILES = int(os.environ.get("GEOLANDY_PERFILES_MAXIMO", "50"))
+VALORES_ACTIVO = ("1", "true", "si", "sí")
+
+
+def activo():
+    """
+    Indica si el perfilado está activo (variable de entorno GEOLANDY_PERFIL).
+    """
+    return os.environ.get("GEOLANDY_PERFIL", "").lower() in VALORES_ACTIVO
+
+
+def rotar(maximo=None):
+    """
+    Elimina los perfiles más antiguos hasta dejar a lo sumo maximo (por defecto
+    MAXIMO_PERFILES) en DIRECTORIO_PERFILES.
+    """
+    if maximo is None:
+        maximo = MAXIMO_PERFILES
+    perfiles = []
+    for entrada in os.scandir(DIRECTORIO_PERFILES):
+        if entrada.name.endswith(".prof"):
+            try:
+                perfiles.append((entrada.stat().st_mtime, entrada.path))
+            except FileNotFoundError:
+                pass  # Lo eliminó otra sesión
+    for _, ruta in sorted(perfiles)[:max(len(perfiles) - maximo, 0)]:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+class Perfil:
+    """
+    Perfil de una ejecución: se inicia al crearlo y guardar() lo detiene y lo escribe.
+    """
+
+    def __init__(self, etiqueta):
+        self.etiqueta = re.sub(r"[^\w]", "", str(etiqueta)) or "consulta"
+        self.perfil = cProfile.Profile()
+        self.perfil.enable()
+
+    def guardar(self):
+        """
+        Detiene el perfil, lo escribe en DIRECTORIO_PERFILES y elimina los más antiguos
+        que sobren. Devuelve la ruta del archivo.
+        """
+        self.perfil.disable()
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        fecha = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        ruta = os.path.join(DIRECTORIO_PERFILES, f"{self.etiqueta}_{fecha}.prof")
+        self.perfil.dump_stats(ruta)
+        rotar()
+        return ruta
+
+
+def iniciar(etiqueta):
+    """
+    Inicia un Perfil si el perfilado está activo; si no, devuelve None. También devuelve
+    None si otra sesión ya está perfilando (desde Python 3.12 solo puede haber un
+    perfilador activo por proceso).
+    """
+    if not activo():
+        return None
+    try:
+        return Perfil(etiqueta)
+    except ValueError:
+        return None
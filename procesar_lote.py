@@ -0,0 +1,160 @@
+"""
+Script procesar_lote.py - Clasificación por lotes de archivos grandes de puntos.
+
+Lee un CSV de puntos (permisos geocodificados, registros de sensores, ...) por bloques,
+asigna a cada punto el CHIP del predio y la zonificación que lo contienen y escribe
+cada bloque en la salida antes de leer el siguiente, de modo que la memoria no crece
+con el tamaño del archivo. Cada bloque se clasifica de forma vectorizada: el predio con
+una sola consulta al índice espacial y la zona con la grilla de clasificador_zonas.py.
+
+Con --procesos N los bloques se reparten entre N procesos, que adjuntan las capas del
+almacén compartido (ver almacen_compartido.py); solo hay un número acotado de bloques
+en vuelo y la salida conserva el orden de la entrada.
+
+Uso:
+    python procesar_lote.py PUNTOS.csv SALIDA.csv [--x X] [--y Y] [--crs EPSG:9377]
+                            [--tamano-bloque 100000] [--procesos 1]
+"""
+
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+
+import almacen_compartido
+import clasificador_zonas
+import datos
+
+TAMANO_BLOQUE = 100_000
+BLOQUES_EN_VUELO_POR_PROCESO = 2
+
+# Capas y clasificador del proceso actual (los inicializa _iniciar)
+_estado = {}
+
+
+def _iniciar(huella, crs_entrada):
+    """
+    Carga las capas (adjuntando el almacén compartido si existe) y construye el
+    clasificador de zonas. Se ejecuta una vez por proceso.
+    """
+    predios, zonas, _ = almacen_compartido.cargar_capas(huella)
+    _estado.update(
+        predios_chip=predios["CHIP"].to_numpy(dtype=object),
+        sindex=predios.sindex,
+        zonificacion=zonas["ZONIFICACI"].astype(object).to_numpy(),
+        clasificador=clasificador_zonas.ClasificadorZonas(zonas),
+        transformador=None if crs_entrada is None else
+        Transformer.from_crs(crs_entrada, f"EPSG:{datos.EPSG_TRABAJO}", always_xy=True),
+    )
+
+
+def leer_bloques(ruta, tamano):
+    """
+    Genera los bloques del CSV de entrada, de tamano filas cada uno.
+    """
+    with pd.read_csv(ruta, chunksize=tamano) as lector:
+        yield from lector
+
+
+def clasificar_bloque(bloque, columna_x, columna_y):
+    """
+    Devuelve el bloque con las columnas CHIP y ZONIFICACI (vacías si el punto no cae
+    en ningún predio o zona). Las coordenadas no numéricas quedan sin clasificar.
+    """
+    x = pd.to_numeric(bloque[columna_x], errors="coerce").to_numpy(dtype=float)
+    y = pd.to_numeric(bloque[columna_y], errors="coerce").to_numpy(dtype=float)
+    if _estado["transformador"] is not None:
+        x, y = _estado["transformador"].transform(x, y)
+
+    validos = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    chips = np.full(len(bloque), None, dtype=object)
+    zonificacion = np.full(len(bloque), None, dtype=object)
+
+    # Predio: una consulta al índice para todo el bloque; si un punto toca varios predios
+    # (p. ej. en un lindero) se toma el primero de la capa
+    puntos, posiciones = _estado["sindex"].query(shapely.points(x[validos], y[validos]), predicate="intersects")
+    orden = np.lexsort((posiciones, puntos))
+    puntos, posiciones = puntos[orden], posiciones[orden]
+    primeros = np.ones(len(puntos), dtype=bool)
+    primeros[1:] = puntos[1:] != puntos[:-1]
+    chips[validos[puntos[primeros]]] = _estado["predios_chip"][posiciones[primeros]]
+
+    # Zona: grilla precalculada
+    zonas = _estado["clasificador"].clasificar_puntos(x[validos], y[validos])
+    dentro = zonas != clasificador_zonas.FUERA
+    zonificacion[validos[dentro]] = _estado["zonificacion"][zonas[dentro]]
+
+    return bloque.assign(CHIP=chips, ZONIFICACI=zonificacion)
+
+
+def procesar_en_serie(bloques, columna_x, columna_y):
+    for bloque in bloques:
+        yield clasificar_bloque(bloque, columna_x, columna_y)
+
+
+def procesar_en_paralelo(bloques, columna_x, columna_y, procesos, huella, crs_entrada):
+    """
+    Reparte los bloques entre procesos con a lo sumo BLOQUES_EN_VUELO_POR_PROCESO
+    bloques pendientes por proceso, y los devuelve en el orden de la entrada.
+    """
+    en_vuelo = deque()
+    limite = procesos * BLOQUES_EN_VUELO_POR_PROCESO
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=get_context("spawn"),
+                             initializer=_iniciar, initargs=(huella, crs_entrada)) as ejecutor:
+        for bloque in bloques:
+            en_vuelo.append(ejecutor.submit(clasificar_bloque, bloque, columna_x, columna_y))
+            if len(en_vuelo) >= limite:
+                yield en_vuelo.popleft().result()
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clasifica por predio y zonificación un CSV grande de puntos.")
+    parser.add_argument("entrada", help="CSV de entrada con columnas de coordenadas")
+    parser.add_argument("salida", help="CSV de salida (entrada + CHIP + ZONIFICACI)")
+    parser.add_argument("--x", default="X", help="Columna de la coordenada X o longitud")
+    parser.add_argument("--y", default="Y", help="Columna de la coordenada Y o latitud")
+    parser.add_argument("--crs", default=f"EPSG:{datos.EPSG_TRABAJO}",
+                        help="Sistema de referencia de las coordenadas (p. ej. EPSG:4326)")
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos para clasificar bloques en paralelo")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    huella = datos.huella_datos()
+    crs_entrada = None if args.crs.upper() == f"EPSG:{datos.EPSG_TRABAJO}" else args.crs
+
+    bloques = leer_bloques(args.entrada, args.tamano_bloque)
+    if args.procesos > 1:
+        # El proceso principal publica el almacén compartido; los procesos de trabajo lo adjuntan
+        almacen_compartido.cargar_capas(huella)
+        resultados = procesar_en_paralelo(bloques, args.x, args.y, args.procesos, huella, crs_entrada)
+    else:
+        _iniciar(huella, crs_entrada)
+        resultados = procesar_en_serie(bloques, args.x, args.y)
+
+    filas = con_predio = con_zona = 0
+    for numero, resultado in enumerate(resultados):
+        resultado.to_csv(args.salida, mode="w" if numero == 0 else "a", header=numero == 0, index=False)
+        filas += len(resultado)
+        con_predio += int(resultado["CHIP"].notna().sum())
+        con_zona += int(resultado["ZONIFICACI"].notna().sum())
+        print(f"\r{filas:,} puntos procesados", end="", file=sys.stderr, flush=True)
+
+    segundos = time.perf_counter() - inicio
+    print(file=sys.stderr)
+    print(f"{filas:,} puntos en {segundos:.1f} s ({filas / max(segundos, 1e-9):,.0f} puntos/s) | "
+          f"En un predio: {con_predio:,} | En una zona: {con_zona:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
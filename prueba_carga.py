@@ -0,0 +1,333 @@
+"""
+Script prueba_carga.py - Prueba de carga de landy4.py con sesiones concurrentes.
+
+Levanta una instancia de la aplicación (streamlit run, sin navegador) y la conecta a
+varias sesiones simuladas que hablan el mismo protocolo WebSocket que el navegador.
+Cada sesión hace una mezcla de consultas por CHIP, por coordenadas y reportes PDF sobre
+los shapefiles incluidos. Al final reporta el rendimiento total, las latencias
+p50/p95/p99 por acción y la memoria máxima del proceso del servidor.
+
+Los widgets se ubican por su key a partir del id que les asigna Streamlit
+("$$ID-<hash>-<key>", leído con streamlit.runtime.state.common). Ese formato y el
+protocolo son internos de Streamlit; el script sigue los de Streamlit 1.66, cuyo
+servidor ya no usa tornado, así que el cliente WebSocket es el paquete websockets que
+Streamlit instala. Si un widget con key no aparece, la prueba se detiene en lugar de
+contarlo como un error de la acción.
+
+Uso:
+    python prueba_carga.py [--sesiones 8] [--acciones 20] [--mezcla chip=0.5,coordenadas=0.3,pdf=0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.runtime.state.common import is_element_id, user_key_from_element_id
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+import almacen_compartido
+import datos
+import estadisticas
+
+RUTA_APP = os.path.join(datos.DIRECTORIO_BASE, "landy4.py")
+ACCIONES = ("chip", "coordenadas", "pdf")
+PERCENTILES = (50, 95, 99)
+TAMANO_MAXIMO_MENSAJE = 512 * 1024 * 1024
+
+
+def preparar_cargas(semilla):
+    """
+    Toma de los shapefiles los CHIP y coordenadas que usarán las sesiones simuladas:
+    CHIP cualquiera, CHIP afectados (los únicos con botón de PDF) y puntos tanto
+    dentro de predios como entre predios (para ejercitar la búsqueda de cercanos).
+    """
+    huella = datos.huella_datos()
+    predios, zonas, reserva_gdf = almacen_compartido.cargar_capas(huella)
+    tabla, _ = estadisticas.cargar_o_calcular(predios, zonas, huella)
+
+    rng = np.random.default_rng(semilla)
+    dentro = predios.geometry.representative_point().sample(n=min(200, len(predios)), random_state=semilla)
+    minx, miny, maxx, maxy = reserva_gdf.total_bounds
+    fuera = zip(rng.uniform(minx, maxx, 100), rng.uniform(miny, maxy, 100))
+
+    return {
+        "chips": predios["CHIP"].dropna().unique().tolist(),
+        "chips_afectados": tabla.index[tabla["AREA_AFECTADA"] > 0].tolist(),
+        "puntos": [(p.x, p.y) for p in dentro] + [(float(x), float(y)) for x, y in fuera],
+    }
+
+
+# --- SERVIDOR BAJO PRUEBA ---
+
+def iniciar_servidor(puerto, tiempo_limite=120):
+    """
+    Inicia `streamlit run landy4.py` sin navegador y espera a que responda el health check.
+    """
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", RUTA_APP, "--server.headless", "true",
+         "--server.port", str(puerto), "--browser.gatherUsageStats", "false"],
+        cwd=datos.DIRECTORIO_BASE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    limite = time.monotonic() + tiempo_limite
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{puerto}/_stcore/health", timeout=2) as r:
+                if r.read() == b"ok":
+                    return proceso
+        except OSError:
+            time.sleep(0.5)
+
+    proceso.terminate()
+    raise RuntimeError(f"El servidor de Streamlit no respondió en {tiempo_limite} s")
+
+
+def memoria_maxima_mb(pid):
+    """
+    Devuelve el pico de memoria residente de un proceso en MB: VmHWM en Linux y, con
+    psutil, peak_wset en Windows o la memoria residente al final en otros sistemas.
+    Sin ninguno de los dos devuelve NaN.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+
+    try:
+        import psutil
+    except ImportError:
+        return float("nan")
+    memoria = psutil.Process(pid).memory_info()
+    return getattr(memoria, "peak_wset", memoria.rss) / 1024 ** 2
+
+
+# --- SESIÓN SIMULADA ---
+
+class WidgetNoEncontrado(RuntimeError):
+    """
+    Un widget con key no apareció en la página: cambió la aplicación o el formato de
+    los ids de Streamlit, y los resultados de la prueba no serían válidos.
+    """
+
+
+class Sesion:
+    """
+    Una sesión del navegador: envía el estado de los widgets en cada ejecución y espera
+    a que el script termine, como hace el frontend de Streamlit.
+    """
+
+    def __init__(self, url, cargas, rng):
+        self.url = url
+        self.cargas = cargas
+        self.rng = rng
+        self.widgets = {}   # key del widget -> (id, tipo, proto)
+        self.estados = {}   # id del widget -> WidgetState
+
+    async def conectar(self):
+        self.ws = await connect(self.url, subprotocols=["streamlit"], max_size=TAMANO_MAXIMO_MENSAJE)
+        await self._ejecutar()
+
+    async def cerrar(self):
+        await self.ws.close()
+
+    def _registrar(self, elemento):
+        tipo = elemento.WhichOneof("type")
+        proto = getattr(elemento, tipo)
+        id_widget = getattr(proto, "id", "")
+        if isinstance(id_widget, str) and is_element_id(id_widget):
+            clave = user_key_from_element_id(id_widget)
+            if clave is not None:
+                self.widgets[clave] = (id_widget, tipo, proto)
+
+    def _widget(self, clave):
+        if clave not in self.widgets:
+            raise WidgetNoEncontrado(f"No se encontró el widget con key '{clave}' "
+                                     f"(keys encontradas: {sorted(self.widgets)})")
+        return self.widgets[clave]
+
+    def fijar(self, clave, valor):
+        id_widget, tipo, proto = self._widget(clave)
+        estado = WidgetState(id=id_widget)
+        if tipo == "radio":
+            # En Streamlit 1.66 el radio se envía como el texto de la opción, no su posición
+            if valor not in proto.options:
+                raise WidgetNoEncontrado(f"El radio '{clave}' no tiene la opción '{valor}'")
+            estado.string_value = valor
+        elif tipo == "text_input":
+            estado.string_value = valor
+        else:
+            estado.double_value = valor
+        self.estados[id_widget] = estado
+
+    async def _ejecutar(self, boton=None):
+        """
+        Pide una ejecución del script con el estado actual (y un clic en `boton`, si se indica)
+        y devuelve la latencia hasta que termina, incluidas las ejecuciones por st.rerun().
+        """
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ""
+        mensaje.rerun_script.widget_states.widgets.extend(self.estados.values())
+        if boton is not None:
+            mensaje.rerun_script.widget_states.widgets.add(id=self._widget(boton)[0], trigger_value=True)
+
+        inicio = time.perf_counter()
+        await self.ws.send(mensaje.SerializeToString())
+
+        error = None
+        while True:
+            try:
+                recibido = await self.ws.recv()
+            except ConnectionClosed as e:
+                raise ConnectionError("El servidor cerró la conexión") from e
+            respuesta = ForwardMsg.FromString(recibido)
+            tipo = respuesta.WhichOneof("type")
+
+            if tipo == "delta" and respuesta.delta.WhichOneof("type") == "new_element":
+                elemento = respuesta.delta.new_element
+                self._registrar(elemento)
+                if elemento.WhichOneof("type") == "exception":
+                    error = elemento.exception.message
+                elif elemento.WhichOneof("type") == "alert" and elemento.alert.format == Alert.ERROR:
+                    error = elemento.alert.body
+            elif tipo == "script_finished" and respuesta.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+
+        latencia = time.perf_counter() - inicio
+        if error is not None:
+            raise RuntimeError(error)
+        return latencia
+
+    async def chip(self, chip=None):
+        self.fijar("modo", "Por CHIP")
+        await self._ejecutar()
+        self.fijar("chip", chip or self.rng.choice(self.cargas["chips"]))
+        return await self._ejecutar(boton="btn_buscar_chip")
+
+    async def coordenadas(self):
+        x, y = self.rng.choice(self.cargas["puntos"])
+        self.fijar("modo", "Por coordenadas")
+        await self._ejecutar()
+        self.fijar("coord_x", x)
+        self.fijar("coord_y", y)
+        return await self._ejecutar(boton="btn_buscar_coord")
+
+    async def pdf(self):
+        # Primero se consulta un predio afectado; solo se mide la generación del reporte
+        await self.chip(self.rng.choice(self.cargas["chips_afectados"]))
+        return await self._ejecutar(boton="btn_pdf")
+
+
+async def ejecutar_sesion(indice, url, cargas, args, latencias, errores):
+    rng = random.Random(args.semilla + indice)
+    sesion = Sesion(url, cargas, rng)
+    await sesion.conectar()
+    nombres, pesos = zip(*args.mezcla.items())
+
+    for _ in range(args.acciones):
+        accion = rng.choices(nombres, weights=pesos)[0]
+        try:
+            latencias[accion].append(await getattr(sesion, accion)())
+        except WidgetNoEncontrado:
+            raise
+        except Exception as e:
+            errores[accion].append(str(e))
+
+    await sesion.cerrar()
+
+
+async def ejecutar_prueba(url, cargas, args):
+    latencias, errores = defaultdict(list), defaultdict(list)
+
+    # Una sesión de calentamiento carga los datos y llena las cachés antes de medir
+    calentamiento = Sesion(url, cargas, random.Random(args.semilla))
+    await calentamiento.conectar()
+    await calentamiento.cerrar()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(ejecutar_sesion(i, url, cargas, args, latencias, errores)
+                           for i in range(args.sesiones)))
+    return latencias, errores, time.perf_counter() - inicio
+
+
+def leer_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        accion, peso = parte.split("=")
+        if accion not in ACCIONES:
+            raise argparse.ArgumentTypeError(f"Acción desconocida en la mezcla: {accion}")
+        mezcla[accion] = float(peso)
+    return mezcla
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de Geolandy con sesiones concurrentes.")
+    parser.add_argument("--sesiones", type=int, default=8, help="Sesiones simultáneas")
+    parser.add_argument("--acciones", type=int, default=20, help="Acciones por sesión")
+    parser.add_argument("--mezcla", type=leer_mezcla, default="chip=0.5,coordenadas=0.3,pdf=0.2",
+                        help="Pesos de cada acción, p. ej. chip=0.5,coordenadas=0.3,pdf=0.2")
+    parser.add_argument("--puerto", type=int, default=8599, help="Puerto del servidor bajo prueba")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Ruta opcional de un JSON con los resultados")
+    args = parser.parse_args(argv)
+
+    cargas = preparar_cargas(args.semilla)
+    servidor = iniciar_servidor(args.puerto)
+    try:
+        url = f"ws://localhost:{args.puerto}/_stcore/stream"
+        latencias, errores, duracion = asyncio.run(ejecutar_prueba(url, cargas, args))
+        memoria_mb = memoria_maxima_mb(servidor.pid)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    total = sum(len(v) for v in latencias.values())
+    resultados = {
+        "sesiones": args.sesiones,
+        "duracion_s": duracion,
+        "acciones_por_s": total / duracion,
+        "memoria_maxima_servidor_mb": memoria_mb,
+        "acciones": {},
+    }
+
+    print(f"{args.sesiones} sesiones | {total} acciones en {duracion:.1f} s | "
+          f"{resultados['acciones_por_s']:.2f} acciones/s | Memoria máxima del servidor: {memoria_mb:.0f} MB")
+    print(f"{'Acción':<12}{'n':>6}{'errores':>9}" + "".join(f"{'p' + str(p) + ' (s)':>11}" for p in PERCENTILES))
+
+    for accion in args.mezcla:
+        valores = np.array(latencias[accion])
+        cuantiles = np.percentile(valores, PERCENTILES) if len(valores) else [float("nan")] * len(PERCENTILES)
+        resultados["acciones"][accion] = {
+            "n": len(valores),
+            "errores": len(errores[accion]),
+            **{f"p{p}_s": float(q) for p, q in zip(PERCENTILES, cuantiles)},
+        }
+        print(f"{accion:<12}{len(valores):>6}{len(errores[accion]):>9}" + "".join(f"{q:>11.3f}" for q in cuantiles))
+
+    for accion, mensajes in errores.items():
+        print(f"Primer error en '{accion}': {mensajes[0]}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
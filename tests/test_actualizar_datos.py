@@ -0,0 +1,83 @@
+"""
+Actualización incremental: huellas de geometría, clasificación de CHIP agregados,
+eliminados y modificados, recálculo parcial de la tabla e instalación de la capa.
+"""
+
+import os
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pd = pytest.importorskip("pandas")
+shapely = pytest.importorskip("shapely")
+
+import actualizar_datos  # noqa: E402
+import datos  # noqa: E402
+import estadisticas  # noqa: E402
+
+
+def _predios(filas):
+    chips, geometrias = zip(*filas)
+    return gpd.GeoDataFrame({"CHIP": list(chips)}, geometry=list(geometrias), crs="EPSG:9377")
+
+
+ANTERIORES = _predios([
+    ("AAA0000AAAA", shapely.box(0, 0, 10, 10)),
+    ("AAA0000BBBB", shapely.box(10, 0, 20, 10)),
+    ("AAA0000CCCC", shapely.box(20, 0, 30, 10)),
+    ("AAA0000DDDD", shapely.box(0, 20, 5, 25)),
+    ("AAA0000DDDD", shapely.box(10, 20, 15, 25)),
+])
+NUEVOS = _predios([
+    # Misma geometría con otro orden de vértices y de partes: sin cambios
+    ("AAA0000AAAA", shapely.Polygon([(10, 10), (0, 10), (0, 0), (10, 0)])),
+    ("AAA0000DDDD", shapely.box(10, 20, 15, 25)),
+    ("AAA0000DDDD", shapely.box(0, 20, 5, 25)),
+    ("AAA0000BBBB", shapely.box(10, 0, 25, 10)),  # Modificado
+    ("AAA0000EEEE", shapely.box(30, 0, 40, 10)),  # Agregado; CCCC se elimina
+])
+ZONAS = gpd.GeoDataFrame({"ZONIFICACI": ["Preservación", "Restauración"]},
+                         geometry=[shapely.box(0, 0, 15, 30), shapely.box(15, 0, 40, 30)], crs="EPSG:9377")
+
+
+def test_huella_por_chip():
+    huellas = actualizar_datos.huellas_geometria(ANTERIORES)
+    assert sorted(huellas.index) == ["AAA0000AAAA", "AAA0000BBBB", "AAA0000CCCC", "AAA0000DDDD"]
+    # Es la misma huella que usa la aplicación para la caché de reportes
+    predio = ANTERIORES[ANTERIORES["CHIP"] == "AAA0000DDDD"]
+    assert huellas["AAA0000DDDD"] == datos.combinar_huellas(datos.huellas_geometrias(predio.geometry.values))
+
+
+def test_comparar():
+    cambios = actualizar_datos.comparar(actualizar_datos.huellas_geometria(ANTERIORES),
+                                        actualizar_datos.huellas_geometria(NUEVOS))
+    assert cambios == {"agregados": ["AAA0000EEEE"], "eliminados": ["AAA0000CCCC"],
+                       "modificados": ["AAA0000BBBB"]}
+
+
+def test_actualizar_tabla_igual_a_recalcular_todo():
+    cambios = actualizar_datos.comparar(actualizar_datos.huellas_geometria(ANTERIORES),
+                                        actualizar_datos.huellas_geometria(NUEVOS))
+    tabla = actualizar_datos.actualizar_tabla(estadisticas.tabla_afectacion(ANTERIORES, ZONAS), NUEVOS, ZONAS, cambios)
+    completa = estadisticas.tabla_afectacion(NUEVOS, ZONAS)
+    pd.testing.assert_frame_equal(tabla.sort_index()[completa.columns], completa.sort_index(), check_like=True)
+
+
+def test_instalar_capa_retira_los_auxiliares(tmp_path, monkeypatch):
+    instalada = tmp_path / "PREDIOS.shp"
+    nueva = tmp_path / "nueva" / "OTRO_NOMBRE.shp"
+    nueva.parent.mkdir()
+    for extension in (".shp", ".shx", ".dbf", ".prj", ".sbn", ".sbx", ".shp.xml"):
+        (tmp_path / f"PREDIOS{extension}").write_text("anterior")
+    for extension in (".shp", ".shx", ".dbf", ".prj"):
+        (nueva.parent / f"OTRO_NOMBRE{extension}").write_text("nueva")
+    monkeypatch.setattr(datos, "RUTA_PREDIOS_ORIGINAL", str(instalada))
+    monkeypatch.setattr(datos, "DIRECTORIO_CACHE", str(tmp_path / "cache"))
+
+    actualizar_datos.instalar_capa(str(nueva), "v1")
+
+    instalados = sorted(f for f in os.listdir(tmp_path) if f.startswith("PREDIOS"))
+    assert instalados == ["PREDIOS.dbf", "PREDIOS.prj", "PREDIOS.shp", "PREDIOS.shx"]
+    assert (tmp_path / "PREDIOS.shp").read_text() == "nueva"
+    respaldo = sorted(os.listdir(tmp_path / "cache" / "respaldo_v1"))
+    assert respaldo == sorted(f"PREDIOS{e}" for e in (".shp", ".shx", ".dbf", ".prj", ".sbn", ".sbx", ".shp.xml"))
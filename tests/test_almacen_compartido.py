@@ -0,0 +1,83 @@
+"""
+Almacén compartido: ida y vuelta de las capas, atributos mapeados sin copia y poda
+de versiones anteriores.
+"""
+
+import os
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+shapely = pytest.importorskip("shapely")
+
+import almacen_compartido  # noqa: E402
+import datos  # noqa: E402
+
+
+@pytest.fixture
+def capas(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen_compartido, "DIRECTORIO_ALMACEN", str(tmp_path))
+    predios = gpd.GeoDataFrame({"CHIP": ["AAA0000AAAA", "AAA0000BBBB"]},
+                               geometry=[shapely.box(0, 0, 10, 10), shapely.box(10, 0, 20, 10)],
+                               crs="EPSG:9377")
+    zonas = datos.compactar_zonas(gpd.GeoDataFrame(
+        {"ZONIFICACI": ["Preservación", "Restauración"], "DESCRIPCI": ["Zona ñ", None],
+         "ACTO_ZONIF": ["Res. 1", "Res. 1"], "ACT_PERMIT": ["A. B.", ""], "ACT_PROHIB": ["C.", "D."]},
+        geometry=[shapely.box(0, 0, 15, 10), shapely.box(15, 0, 20, 10)], crs="EPSG:9377"))
+    reserva = gpd.GeoDataFrame(geometry=[zonas.geometry.union_all()], crs=zonas.crs)
+    return predios, zonas, reserva
+
+
+def test_ida_y_vuelta(capas):
+    almacen_compartido.publicar("v1", *capas)
+    adjuntas = almacen_compartido.adjuntar("v1")
+
+    for original, adjunta in zip(capas, adjuntas):
+        assert adjunta.crs == original.crs
+        assert shapely.equals(adjunta.geometry.values, original.geometry.values).all()
+        for columna in original.columns.drop("geometry"):
+            esperado = original[columna].astype(object).where(original[columna].notna(), None).tolist()
+            obtenido = adjunta[columna].astype(object).where(adjunta[columna].notna(), None).tolist()
+            assert obtenido == esperado
+
+
+
+def test_atributos_sin_copia(capas, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    almacen_compartido.publicar("v1", *capas)
+
+    mapeados = {}
+    cargar = np.load
+
+    def registrar(ruta, *args, **kwargs):
+        mapeados[os.path.basename(ruta)] = arreglo = cargar(ruta, *args, **kwargs)
+        return arreglo
+
+    monkeypatch.setattr(np, "load", registrar)
+    predios, zonas, _ = almacen_compartido.adjuntar("v1")
+
+    assert isinstance(zonas["ZONIFICACI"].dtype, pd.CategoricalDtype)
+    assert np.shares_memory(zonas["ZONIFICACI"].array.codes, mapeados["zonas_ZONIFICACI_codigos.npy"])
+    bufer = pa.array(predios["CHIP"].array).buffers()[2]
+    assert bufer.address == pa.py_buffer(mapeados["predios_CHIP_utf8.npy"]).address
+
+
+def test_poda_conserva_la_version_previa(capas):
+    for version in ("v1", "v2", "v3"):
+        almacen_compartido.publicar(version, *capas)
+        # Fechas de publicación distintas aunque el sistema de archivos tenga poca resolución
+        os.utime(almacen_compartido._directorio(version), (0, {"v1": 1, "v2": 2, "v3": 3}[version]))
+
+    almacen_compartido.podar("v3")
+    assert sorted(os.listdir(almacen_compartido.DIRECTORIO_ALMACEN)) == ["almacen_v2", "almacen_v3"]
+
+
+def test_almacen_podado_al_adjuntar(capas, monkeypatch):
+    almacen_compartido.publicar("v1", *capas)
+    os.remove(os.path.join(almacen_compartido._directorio("v1"), "predios_coords.npy"))
+    monkeypatch.setattr(datos, "leer_capas", lambda: capas)
+
+    with pytest.warns(UserWarning):
+        assert almacen_compartido.cargar_capas("v1") is capas
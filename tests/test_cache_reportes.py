@@ -0,0 +1,77 @@
+"""
+Caché de reportes PDF: llaves, aciertos y desalojo de los reportes usados hace más
+tiempo cuando se supera el tamaño máximo.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("geopandas")  # datos.py la importa al cargarse
+
+import cache_reportes  # noqa: E402
+import datos  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(datos, "DIRECTORIO_CACHE", str(tmp_path))
+    return tmp_path / "reportes"
+
+
+def _generar(contenido=b"%PDF" + b"x" * 96):
+    ruta = cache_reportes.ruta_temporal()
+    with open(ruta, "wb") as f:
+        f.write(contenido)
+    return ruta
+
+
+def test_llave():
+    clave = cache_reportes.clave_reporte("AAA0000AAAA", "zonas1", "predio1", "Borrador")
+    assert clave == cache_reportes.clave_reporte("AAA0000AAAA", "zonas1", "predio1", "Borrador")
+    assert clave != cache_reportes.clave_reporte("AAA0000AAAA", "zonas1", "predio2", "Borrador")
+    assert clave != cache_reportes.clave_reporte("AAA0000AAAA", "zonas2", "predio1", "Borrador")
+    assert clave != cache_reportes.clave_reporte("AAA0000AAAA", "zonas1", "predio1", "Impresión")
+
+
+def test_guardar_y_buscar():
+    assert cache_reportes.buscar("a") is None
+    ruta = cache_reportes.guardar(_generar(), "a")
+    assert cache_reportes.buscar("a") == ruta
+    with open(ruta, "rb") as f:
+        assert f.read().startswith(b"%PDF")
+
+
+def test_desalojo_de_los_menos_usados(directorio):
+    for numero, clave in enumerate(("a", "b", "c"), start=1):
+        ruta = cache_reportes.guardar(_generar(), clave)
+        os.utime(ruta, (numero, numero))
+    temporal = _generar()  # Un reporte en generación no se desaloja
+
+    # Un acierto vuelve a "a" el más reciente: se desaloja "b", el usado hace más tiempo
+    cache_reportes.buscar("a")
+    cache_reportes.desalojar(tamano_maximo=250)
+
+    assert sorted(os.listdir(directorio)) == sorted(["a.pdf", "c.pdf", os.path.basename(temporal)])
+    cache_reportes.desalojar(tamano_maximo=100)
+    assert cache_reportes.buscar("c") is None
+    assert cache_reportes.buscar("a") is not None
+    cache_reportes.desalojar(tamano_maximo=0)
+    assert cache_reportes.buscar("a") is None
+    assert os.path.exists(temporal)
+
+
+def test_guardar_sobre_un_reporte_abierto(monkeypatch):
+    existente = cache_reportes.guardar(_generar(b"%PDF existente"), "a")
+
+    def reemplazar(origen, destino):
+        raise PermissionError(destino)  # Como en Windows con el archivo abierto por otra sesión
+
+    monkeypatch.setattr(os, "replace", reemplazar)
+    nuevo = _generar(b"%PDF nuevo")
+    assert cache_reportes.guardar(nuevo, "a") == existente
+    assert not os.path.exists(nuevo)
+    with open(existente, "rb") as f:
+        assert f.read() == b"%PDF existente"
+    with pytest.raises(PermissionError):
+        cache_reportes.guardar(_generar(), "b")
@@ -0,0 +1,92 @@
+"""
+La grilla de clasificador_zonas.py debe dar la misma zona que la prueba exacta de
+intersección contra el índice espacial; ante zonas superpuestas, la primera de la capa.
+"""
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+np = pytest.importorskip("numpy")
+shapely = pytest.importorskip("shapely")
+
+import clasificador_zonas  # noqa: E402
+from clasificador_zonas import BORDE, FUERA  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def zonas():
+    return gpd.GeoDataFrame(
+        {"ZONIFICACI": ["A", "B", "C", "D"]},
+        geometry=[
+            shapely.box(0, 0, 100, 100),
+            shapely.box(100, 0, 200, 100),
+            shapely.box(50, 50, 150, 150),  # Se superpone con A y con B
+            shapely.Polygon([(0, 200), (200, 200), (100, 300)]),
+        ],
+        crs="EPSG:9377",
+    )
+
+
+@pytest.fixture(scope="module")
+def clasificador(zonas):
+    return clasificador_zonas.ClasificadorZonas(zonas, tamano_celda=10)
+
+
+def _esperado(zonas, x, y):
+    """
+    Zona de cada punto según el índice espacial: la primera de la capa que lo interseca.
+    """
+    puntos, posiciones = zonas.sindex.query(shapely.points(x, y), predicate="intersects")
+    esperado = np.full(len(x), FUERA)
+    for punto, posicion in zip(puntos, posiciones):
+        if esperado[punto] == FUERA or posicion < esperado[punto]:
+            esperado[punto] = posicion
+    return esperado
+
+
+def _celdas(clasificador, x, y):
+    """
+    Valor de la grilla en la celda de cada punto (todos dentro de la extensión de la grilla).
+    """
+    ix = np.floor((x - clasificador.x0) / clasificador.tamano).astype(int)
+    iy = np.floor((y - clasificador.y0) / clasificador.tamano).astype(int)
+    return clasificador.grilla[iy * clasificador.nx + ix]
+
+
+def test_celdas_cubiertas_por_una_zona(zonas, clasificador):
+    x, y = np.meshgrid(np.arange(5, 200, 10.0), np.arange(5, 300, 10.0))
+    x, y = x.ravel(), y.ravel()
+    cubiertas = _celdas(clasificador, x, y) >= 0
+    assert cubiertas.sum() > 100
+
+    resultado = clasificador.clasificar_puntos(x[cubiertas], y[cubiertas])
+    np.testing.assert_array_equal(resultado, _esperado(zonas, x[cubiertas], y[cubiertas]))
+
+
+def test_celdas_de_borde(zonas, clasificador):
+    generador = np.random.default_rng(0)
+    x = generador.uniform(0, 200, 20_000)
+    y = generador.uniform(0, 300, 20_000)
+    # Puntos exactamente sobre los linderos y los vértices
+    x = np.r_[x, 100.0, 100.0, 50.0, 150.0, 0.0, 100.0]
+    y = np.r_[y, 50.0, 100.0, 75.0, 150.0, 0.0, 300.0]
+    borde = _celdas(clasificador, x, y) == BORDE
+    assert borde.sum() > 1000
+
+    resultado = clasificador.clasificar_puntos(x[borde], y[borde])
+    np.testing.assert_array_equal(resultado, _esperado(zonas, x[borde], y[borde]))
+
+
+def test_zonas_superpuestas_gana_la_primera(zonas, clasificador):
+    x = np.array([75.0, 125.0, 55.0, 145.0])
+    y = np.array([75.0, 75.0, 95.0, 55.0])
+    np.testing.assert_array_equal(clasificador.clasificar_puntos(x, y), [0, 1, 0, 1])
+    np.testing.assert_array_equal(clasificador.clasificar_puntos(x, y), _esperado(zonas, x, y))
+    assert clasificador.zona_en(125.0, 125.0)["ZONIFICACI"] == "C"
+
+
+def test_fuera_de_la_grilla(zonas, clasificador):
+    x = np.array([-1.0, 250.0, 100.0, 100.0, -1e9, np.nan, 210.0])
+    y = np.array([50.0, 50.0, -0.5, 311.0, 1e9, 10.0, 305.0])
+    np.testing.assert_array_equal(clasificador.clasificar_puntos(x, y), [FUERA] * len(x))
+    assert clasificador.zona_en(-1.0, 50.0) is None
@@ -0,0 +1,79 @@
+"""
+Exportación por lotes: mismas filas en los tres formatos sin importar el tamaño del
+lote, y ningún archivo cuando no se encuentra ningún CHIP.
+"""
+
+import csv
+import json
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pyogrio = pytest.importorskip("pyogrio")
+shapely = pytest.importorskip("shapely")
+
+import datos  # noqa: E402
+import exportar  # noqa: E402
+
+CHIPS = ["AAA0000AAAA", "AAA0000BBBB", "AAA0000CCCC"]
+
+
+@pytest.fixture(scope="module")
+def capas():
+    predios = gpd.GeoDataFrame(
+        {"CHIP": CHIPS + ["AAA0000AAAA"]},
+        geometry=[shapely.box(0, 0, 10, 10), shapely.box(10, 0, 20, 10), shapely.box(500, 500, 510, 510),
+                  shapely.box(0, 20, 5, 25)],  # Segunda parte de AAA0000AAAA
+        crs="EPSG:9377",
+    )
+    zonas = datos.compactar_zonas(gpd.GeoDataFrame(
+        {"ZONIFICACI": ["Preservación", "Restauración"], "DESCRIPCI": ["", ""], "ACTO_ZONIF": ["Res. 1", "Res. 2"],
+         "ACT_PERMIT": ["", ""], "ACT_PROHIB": ["", ""]},
+        geometry=[shapely.box(0, 0, 15, 30), shapely.box(15, 0, 30, 30)], crs="EPSG:9377"))
+    return predios, zonas
+
+
+# AAA0000AAAA: 2 partes, cada una en una zona; BBBB: 2 zonas; CCCC: fuera de la reserva
+PREDIOS_ESPERADOS = 4
+ZONAS_ESPERADAS = 4
+
+
+def _contar(formato, ruta):
+    if formato == "CSV":
+        with open(ruta, encoding="utf-8", newline="") as f:
+            filas = list(csv.DictReader(f))
+        return sum(f["CAPA"] == "predio" for f in filas), sum(f["CAPA"] == "zona_afectada" for f in filas)
+    if formato == "GeoJSON":
+        with open(ruta, encoding="utf-8") as f:
+            capas = [f["properties"]["CAPA"] for f in json.load(f)["features"]]
+        return capas.count("predio"), capas.count("zona_afectada")
+    return (pyogrio.read_info(ruta, layer="predios")["features"],
+            pyogrio.read_info(ruta, layer="zonas_afectadas")["features"])
+
+
+@pytest.mark.parametrize("formato", list(exportar.FORMATOS))
+@pytest.mark.parametrize("tamano_lote", [1, 2, exportar.TAMANO_LOTE])
+def test_filas_por_lotes(capas, tmp_path, formato, tamano_lote):
+    predios, zonas = capas
+    ruta = tmp_path / f"salida.{exportar.FORMATOS[formato][0]}"
+    # CHIP repetidos y desconocidos no agregan filas
+    chips = CHIPS + ["AAA0000BBBB", "ZZZ9999ZZZZ"]
+    exportar.ESCRITORES[formato](exportar.lotes_resultados(predios, zonas, chips, tamano=tamano_lote), str(ruta))
+    assert _contar(formato, str(ruta)) == (PREDIOS_ESPERADOS, ZONAS_ESPERADAS)
+
+
+@pytest.mark.parametrize("formato", list(exportar.FORMATOS))
+def test_exportar_cuenta_los_chip(capas, tmp_path, formato):
+    predios, zonas = capas
+    ruta = tmp_path / f"salida.{exportar.FORMATOS[formato][0]}"
+    assert exportar.exportar(predios, zonas, CHIPS + ["ZZZ9999ZZZZ"], formato, str(ruta)) == 3
+    assert ruta.exists()
+
+
+@pytest.mark.parametrize("formato", list(exportar.FORMATOS))
+def test_sin_resultados_no_escribe_archivo(capas, tmp_path, formato):
+    predios, zonas = capas
+    ruta = tmp_path / f"salida.{exportar.FORMATOS[formato][0]}"
+    assert exportar.exportar(predios, zonas, ["ZZZ9999ZZZZ"], formato, str(ruta)) == 0
+    assert exportar.exportar(predios, zonas, [], formato, str(ruta)) == 0
+    assert not ruta.exists()
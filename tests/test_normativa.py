@@ -0,0 +1,56 @@
+"""
+Los bloques que normativa.py diagrama al cargar los datos deben producir en el PDF
+las mismas líneas, posiciones y espaciado entre palabras que multi_cell justificado.
+"""
+
+import re
+
+import pytest
+
+fpdf = pytest.importorskip("fpdf")
+
+import normativa  # noqa: E402
+
+TEXTO = (
+    "Las actividades permitidas en la zona de preservación comprenden la investigación científica, "
+    "el monitoreo ambiental y la educación ambiental controlada, siempre que no impliquen la "
+    "remoción de cobertura vegetal nativa ni la construcción de infraestructura permanente. "
+    "Palabraextremadamentelargasinespaciosquenocabeenunasolalineadeltextojustificado"
+    "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa fin."
+)
+
+
+def _lineas_dibujadas(pdf):
+    """
+    Devuelve (texto, espaciado Tw vigente, x, y) de cada línea de texto de la página actual.
+    """
+    espaciado, lineas = 0.0, []
+    for instruccion in pdf.pages[pdf.page].split("\n"):
+        tw = re.fullmatch(r"([\d.]+) Tw", instruccion)
+        if tw:
+            espaciado = float(tw.group(1))
+        texto = re.search(r"BT ([\d.]+) ([\d.]+) Td \((.*)\) Tj ET", instruccion)
+        if texto:
+            lineas.append((texto.group(3), round(espaciado, 2), texto.group(1), texto.group(2)))
+    return lineas
+
+
+@pytest.mark.parametrize("formato", [normativa.FORMATO_DESCRIPCION, normativa.FORMATO_PERMITIDAS,
+                                     normativa.FORMATO_PROHIBIDAS])
+@pytest.mark.parametrize("parrafos", [[TEXTO], ["- Investigación.", "- " + TEXTO[:180], "- Monitoreo."]])
+def test_igual_que_multi_cell(formato, parrafos):
+    estilo, tamano, alto, sangria = formato
+
+    esperado = fpdf.FPDF()
+    esperado.add_page()
+    esperado.set_font(normativa.FUENTE, estilo, tamano)
+    for parrafo in parrafos:
+        esperado.set_x(esperado.l_margin + sangria)
+        esperado.multi_cell(esperado.w - esperado.l_margin - esperado.r_margin - sangria, alto, parrafo, 0, "J")
+
+    obtenido = fpdf.FPDF()
+    obtenido.add_page()
+    normativa.escribir_bloque(obtenido, normativa.diagramar(obtenido, parrafos, formato))
+
+    assert len(_lineas_dibujadas(esperado)) > len(parrafos)
+    assert _lineas_dibujadas(obtenido) == _lineas_dibujadas(esperado)
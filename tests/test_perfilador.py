@@ -0,0 +1,46 @@
+"""
+Perfilador: solo se activa por variable de entorno y conserva un número máximo de
+perfiles.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("geopandas")  # datos.py la importa al cargarse
+
+import perfilador  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfilador, "DIRECTORIO_PERFILES", str(tmp_path))
+    monkeypatch.delenv("GEOLANDY_PERFIL", raising=False)
+    return tmp_path
+
+
+def test_solo_variable_de_entorno(monkeypatch):
+    assert perfilador.iniciar("consulta") is None
+    monkeypatch.setenv("GEOLANDY_PERFIL", "1")
+    assert perfilador.activo()
+
+
+def test_rotacion_conserva_los_mas_recientes(directorio):
+    for i in range(5):
+        ruta = directorio / f"consulta_{i}.prof"
+        ruta.write_bytes(b"")
+        os.utime(ruta, (1000 + i, 1000 + i))
+    (directorio / "notas.txt").write_text("no es un perfil")
+    perfilador.rotar(maximo=2)
+    assert sorted(p.name for p in directorio.iterdir()) == ["consulta_3.prof", "consulta_4.prof", "notas.txt"]
+
+
+def test_guardar_aplica_el_maximo(directorio, monkeypatch):
+    monkeypatch.setenv("GEOLANDY_PERFIL", "1")
+    monkeypatch.setattr(perfilador, "MAXIMO_PERFILES", 1)
+    rutas = []
+    for _ in range(3):
+        perfil = perfilador.iniciar("consulta")
+        assert perfil is not None
+        rutas.append(perfil.guardar())
+    assert [p.name for p in directorio.iterdir()] == [os.path.basename(rutas[-1])]
@@ -0,0 +1,58 @@
+"""
+Clasificación de bloques de procesar_lote.py con bloques que no tienen ningún punto
+dentro de un predio.
+"""
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely")
+pd = pytest.importorskip("pandas")
+
+import clasificador_zonas  # noqa: E402
+import procesar_lote  # noqa: E402
+
+
+@pytest.fixture
+def estado(monkeypatch):
+    predios = gpd.GeoDataFrame({"CHIP": ["AAA0000AAAA", "AAA0000BBBB"]},
+                               geometry=[shapely.box(0, 0, 10, 10), shapely.box(10, 0, 20, 10)],
+                               crs="EPSG:9377")
+    zonas = gpd.GeoDataFrame({"ZONIFICACI": ["Preservación"]},
+                             geometry=[shapely.box(0, 0, 20, 10)], crs="EPSG:9377")
+    monkeypatch.setattr(procesar_lote, "_estado", {
+        "predios_chip": predios["CHIP"].to_numpy(dtype=object),
+        "sindex": predios.sindex,
+        "zonificacion": zonas["ZONIFICACI"].to_numpy(dtype=object),
+        "clasificador": clasificador_zonas.ClasificadorZonas(zonas, tamano_celda=5),
+        "transformador": None,
+    })
+
+
+def test_puntos_en_predios_y_en_el_lindero(estado):
+    bloque = pd.DataFrame({"X": [5.0, 10.0, 15.0], "Y": [5.0, 5.0, 5.0]})
+    resultado = procesar_lote.clasificar_bloque(bloque, "X", "Y")
+    # El punto del lindero toca ambos predios: se toma el primero de la capa
+    assert resultado["CHIP"].tolist() == ["AAA0000AAAA", "AAA0000AAAA", "AAA0000BBBB"]
+    assert resultado["ZONIFICACI"].tolist() == ["Preservación"] * 3
+
+
+def test_bloque_fuera_de_los_predios(estado):
+    bloque = pd.DataFrame({"X": [-50.0, 500.0], "Y": [5.0, 5.0]})
+    resultado = procesar_lote.clasificar_bloque(bloque, "X", "Y")
+    assert resultado["CHIP"].isna().all()
+    assert resultado["ZONIFICACI"].isna().all()
+
+
+def test_coordenadas_no_numericas(estado):
+    bloque = pd.DataFrame({"X": ["sin dato", None], "Y": ["", "abc"]})
+    resultado = procesar_lote.clasificar_bloque(bloque, "X", "Y")
+    assert resultado["CHIP"].isna().all()
+    assert resultado["ZONIFICACI"].isna().all()
+
+
+def test_coordenadas_no_numericas_mezcladas(estado):
+    bloque = pd.DataFrame({"X": ["sin dato", "5"], "Y": ["abc", "5"]})
+    resultado = procesar_lote.clasificar_bloque(bloque, "X", "Y")
+    assert resultado["CHIP"].isna().tolist() == [True, False]
+    assert resultado["CHIP"].iloc[1] == "AAA0000AAAA"
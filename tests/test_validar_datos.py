@@ -0,0 +1,37 @@
+"""
+Regresión de validar_datos.validar_y_reparar con registros que se quedan sin partes
+poligonales (vacíos o astillas) antes de un predio de varias partes.
+"""
+
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely")
+
+import validar_datos  # noqa: E402
+
+
+def _cuadrado(x, y, lado):
+    return shapely.box(x, y, x + lado, y + lado)
+
+
+def test_vacio_astilla_y_multiparte():
+    capa = gpd.GeoDataFrame(
+        {"CHIP": ["AAA0000AAAA", "AAA0000BBBB", "AAA0000CCCC", "AAA0000DDDD"]},
+        geometry=[
+            None,
+            _cuadrado(0, 0, 0.1),
+            shapely.MultiPolygon([_cuadrado(100, 0, 10), _cuadrado(200, 0, 10)]),
+            _cuadrado(300, 0, 10),
+        ],
+        crs="EPSG:9377",
+    )
+
+    limpia, informe = validar_datos.validar_y_reparar(capa, "prueba", "CHIP")
+
+    assert limpia["CHIP"].tolist() == ["AAA0000CCCC", "AAA0000DDDD"]
+    assert informe["geometrias_vacias"] == 1
+    assert informe["astillas_eliminadas"] == 1
+    assert informe["registros_eliminados"] == 2
+    assert shapely.get_num_geometries(limpia.geometry.iloc[0]) == 2
+    assert limpia.geometry.area.tolist() == pytest.approx([200.0, 100.0])
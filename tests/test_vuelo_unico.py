@@ -0,0 +1,102 @@
+"""
+Regresión de vuelo_unico.VueloUnico: las excepciones comunes se comparten con quienes
+esperan el mismo cálculo, las de control de flujo (como las de st.rerun) no.
+"""
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import vuelo_unico
+
+
+class _Reejecutar(BaseException):
+    """
+    Imita las excepciones de control de flujo de Streamlit.
+    """
+
+
+class _Hilo(threading.Thread):
+    """
+    Hilo que guarda el resultado o la excepción de su función para revisarlos en el hilo
+    principal (una excepción dentro de un hilo no hace fallar la prueba por sí sola).
+    """
+
+    def __init__(self, funcion):
+        super().__init__()
+        self.funcion = funcion
+        self.resultado = self.excepcion = None
+
+    def run(self):
+        try:
+            self.resultado = self.funcion()
+        except BaseException as e:
+            self.excepcion = e
+
+    def terminar(self):
+        self.join(timeout=10)
+        assert not self.is_alive()
+        return self.resultado, self.excepcion
+
+
+@pytest.fixture
+def esperando(monkeypatch):
+    """
+    Evento que se activa cuando una llamada empieza a esperar el cálculo de otra.
+    """
+    evento = threading.Event()
+
+    class FuturoObservado(Future):
+        def result(self, timeout=None):
+            evento.set()
+            return super().result(timeout)
+
+    monkeypatch.setattr(vuelo_unico, "Future", FuturoObservado)
+    return evento
+
+
+def _lider_y_seguidor(esperando, excepcion):
+    """
+    Ejecuta un líder que lanza excepcion mientras un seguidor espera la misma llave.
+    Devuelve el registro, lo que recibió el líder y lo que recibió el seguidor.
+    """
+    vuelos = vuelo_unico.VueloUnico()
+    empezo = threading.Event()
+
+    def calculo_lider():
+        empezo.set()
+        assert esperando.wait(timeout=10)
+        raise excepcion
+
+    lider = _Hilo(lambda: vuelos.ejecutar("llave", calculo_lider))
+    lider.start()
+    assert empezo.wait(timeout=10)
+    seguidor = _Hilo(lambda: vuelos.ejecutar("llave", lambda: "propio"))
+    seguidor.start()
+    return vuelos, lider.terminar(), seguidor.terminar()
+
+
+def test_excepcion_se_comparte(esperando):
+    error = ValueError("falla")
+    vuelos, lider, seguidor = _lider_y_seguidor(esperando, error)
+    assert lider == (None, error)
+    assert seguidor == (None, error)
+    assert (vuelos.ejecutados, vuelos.compartidos) == (1, 1)
+
+
+def test_control_de_flujo_no_se_comparte(esperando):
+    interrupcion = _Reejecutar()
+    vuelos, lider, seguidor = _lider_y_seguidor(esperando, interrupcion)
+    assert lider == (None, interrupcion)
+    # El seguidor no recibe la interrupción: vuelve a intentarlo y ejecuta su propio cálculo
+    assert seguidor == ("propio", None)
+    assert (vuelos.ejecutados, vuelos.compartidos) == (2, 1)
+
+
+def test_la_llave_se_libera():
+    vuelos = vuelo_unico.VueloUnico()
+    with pytest.raises(ValueError):
+        vuelos.ejecutar("llave", lambda: int("x"))
+    assert vuelos.ejecutar("llave", lambda: 1) == 1
+    assert vuelos.ejecutados == 2
@@ -0,0 +1,142 @@
+"""
+Script validar_datos.py - Validación y reparación de las capas antes de publicarlas.
+
+Revisa el CRS, las geometrías vacías o inválidas y los CHIP duplicados o vacíos; repara
+las geometrías con make_valid, las ajusta a una grilla de precisión (lo que elimina
+vértices duplicados y hace coincidir bordes casi iguales) y quita las astillas. Escribe
+las capas limpias, ya en EPSG:9377 y solo con las columnas que usa la aplicación, en
+datos_limpios/, junto con un informe. Si ese directorio existe, la aplicación carga las
+capas limpias en lugar de las originales (ver datos.py).
+
+Uso:
+    python validar_datos.py [--precision 0.001] [--area-minima 0.5]
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import geopandas as gpd
+import numpy as np
+import pyogrio
+import shapely
+
+import datos
+
+PRECISION_M = 0.001
+AREA_MINIMA_M2 = 0.5
+TIPOS_POLIGONALES = (shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON)
+
+
+def _solo_poligonos(geometrias, area_minima):
+    """
+    Conserva solo las partes poligonales de cada geometría (make_valid puede devolver
+    colecciones con líneas o puntos) y descarta las partes con área menor a area_minima.
+    Devuelve (geometrías, número de astillas eliminadas).
+    """
+    partes, indices = shapely.get_parts(geometrias, return_index=True)
+    partes, sub_indices = shapely.get_parts(partes, return_index=True)
+    indices = indices[sub_indices]
+
+    poligonos = shapely.get_type_id(partes) == shapely.GeometryType.POLYGON
+    astillas = poligonos & (shapely.area(partes) < area_minima)
+    conservar = poligonos & ~astillas
+
+    # Con out, los registros que se quedan sin partes conservan None en lugar de fallar
+    salida = np.full(len(geometrias), None, dtype=object)
+    shapely.multipolygons(partes[conservar], indices=indices[conservar], out=salida)
+    return salida, int(astillas.sum())
+
+
+def validar_y_reparar(gdf, nombre, columna_id=None, precision=PRECISION_M, area_minima=AREA_MINIMA_M2):
+    """
+    Valida una capa y devuelve (capa reparada en EPSG:9377, informe).
+    """
+    informe = {"capa": nombre, "registros": int(len(gdf)), "crs_original": None}
+
+    if gdf.crs is None:
+        raise ValueError(f"La capa {nombre} no tiene sistema de referencia (.prj); no se puede reproyectar.")
+    informe["crs_original"] = gdf.crs.to_string()
+    gdf = gdf.to_crs(epsg=datos.EPSG_TRABAJO)
+
+    geometrias = np.asarray(gdf.geometry.values)
+    vacias = shapely.is_missing(geometrias) | shapely.is_empty(geometrias)
+    invalidas = ~vacias & ~shapely.is_valid(geometrias)
+    informe["geometrias_vacias"] = int(vacias.sum())
+    informe["geometrias_invalidas"] = int(invalidas.sum())
+    informe["motivos_invalidez"] = sorted(set(shapely.is_valid_reason(geometrias[invalidas]).tolist()))
+
+    # Reparación: make_valid, ajuste a la grilla de precisión y limpieza de partes no poligonales
+    reparadas = geometrias.copy()
+    reparadas[invalidas] = shapely.make_valid(geometrias[invalidas])
+    reparadas[~vacias] = shapely.set_precision(reparadas[~vacias], grid_size=precision)
+    tipos = shapely.get_type_id(reparadas)
+    simples = np.isin(tipos, TIPOS_POLIGONALES) & (shapely.area(reparadas) >= area_minima) \
+        & (shapely.get_num_geometries(reparadas) == 1)
+    reparadas[~simples], informe["astillas_eliminadas"] = _solo_poligonos(reparadas[~simples], area_minima)
+
+    # Registros que quedan sin geometría (vacíos de origen o colapsados al repararlos)
+    sin_geometria = shapely.is_missing(reparadas) | shapely.is_empty(reparadas)
+    informe["registros_eliminados"] = int(sin_geometria.sum())
+    limpia = gdf.set_geometry(gpd.GeoSeries(reparadas, index=gdf.index, crs=gdf.crs))[~sin_geometria]
+
+    if columna_id is not None:
+        identificadores = limpia[columna_id]
+        duplicados = identificadores[identificadores.duplicated(keep=False) & identificadores.notna()]
+        informe[f"{columna_id}_vacios"] = int(identificadores.isna().sum() + (identificadores.astype(str).str.strip() == "").sum())
+        informe[f"{columna_id}_duplicados"] = sorted(duplicados.unique().tolist())
+        if vacias.any():
+            informe[f"{columna_id}_sin_geometria"] = sorted(gdf.loc[vacias, columna_id].dropna().astype(str).tolist())
+
+    informe["registros_limpios"] = int(len(limpia))
+    return limpia.reset_index(drop=True), informe
+
+
+def escribir_capa(gdf, ruta):
+    """
+    Escribe una capa limpia como shapefile (UTF-8), reemplazando la anterior si existe
+    (incluidos sus índices auxiliares, que ya no corresponderían a la geometría).
+    """
+    for componente in datos.componentes_shapefile(ruta) + datos.auxiliares_shapefile(ruta):
+        os.remove(componente)
+    pyogrio.write_dataframe(gdf, ruta, driver="ESRI Shapefile", encoding="UTF-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida y repara las capas de Geolandy.")
+    parser.add_argument("--precision", type=float, default=PRECISION_M, help="Tamaño de la grilla de ajuste (m)")
+    parser.add_argument("--area-minima", type=float, default=AREA_MINIMA_M2, help="Área mínima de una parte (m²)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(datos.DIRECTORIO_LIMPIOS, exist_ok=True)
+    informes = []
+    capas = (
+        (datos.RUTA_PREDIOS_ORIGINAL, datos.COLUMNAS_PREDIOS, "CHIP"),
+        (datos.RUTA_ZONAS_ORIGINAL, datos.COLUMNAS_ZONAS, None),
+    )
+
+    for ruta, columnas, columna_id in capas:
+        nombre = os.path.basename(ruta)
+        original = gpd.read_file(ruta, engine="pyogrio", columns=columnas)
+        limpia, informe = validar_y_reparar(original, nombre, columna_id, args.precision, args.area_minima)
+        escribir_capa(limpia, os.path.join(datos.DIRECTORIO_LIMPIOS, nombre))
+        informes.append(informe)
+
+        print(f"{nombre}: {informe['registros']} registros | {informe['geometrias_invalidas']} inválidas reparadas | "
+              f"{informe['geometrias_vacias']} vacías | {informe['astillas_eliminadas']} astillas | "
+              f"{informe['registros_limpios']} limpios")
+        if columna_id is not None and informe[f"{columna_id}_duplicados"]:
+            print(f"  {len(informe[f'{columna_id}_duplicados'])} {columna_id} duplicados (ver informe)")
+
+    ruta_informe = os.path.join(datos.DIRECTORIO_LIMPIOS, "informe_validacion.json")
+    with open(ruta_informe, "w", encoding="utf-8") as f:
+        json.dump({"generado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "capas": informes},
+                  f, ensure_ascii=False, indent=2)
+    print(f"Informe: {ruta_informe}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
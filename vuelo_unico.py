@@ -0,0 +1,78 @@
+"""
+Módulo vuelo_unico.py - Agrupación de consultas idénticas simultáneas.
+
+Cuando varias sesiones piden al mismo tiempo el mismo cálculo (la misma llave), solo
+la primera lo ejecuta; las demás esperan y reciben su mismo resultado, o su misma
+excepción. Una vez termina, la llave se libera: no es una caché, solo evita repetir
+el trabajo que ya está en curso.
+
+Solo se comparten las excepciones de tipo Exception. Las de control de flujo que
+heredan directamente de BaseException (KeyboardInterrupt, SystemExit, o las que
+usan st.rerun y st.stop de Streamlit) son de la sesión que ejecutaba el cálculo: las
+que esperaban no las reciben, sino que vuelven a intentarlo.
+
+El resultado se comparte entre sesiones, así que quien lo recibe no debe modificarlo.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class _Interrumpido(Exception):
+    """
+    Aviso a quienes esperaban de que el cálculo se interrumpió sin resultado.
+    """
+
+
+class VueloUnico:
+    """
+    Registro de los cálculos en curso, indexados por llave. Seguro entre hilos.
+    """
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._en_curso = {}
+        self.ejecutados = 0
+        self.compartidos = 0
+
+    def ejecutar(self, llave, funcion, *args, **kwargs):
+        """
+        Devuelve funcion(*args, **kwargs), compartiendo el cálculo con las llamadas
+        simultáneas que usen la misma llave.
+        """
+        while True:
+            with self._candado:
+                futuro = self._en_curso.get(llave)
+                lider = futuro is None
+                if lider:
+                    futuro = self._en_curso[llave] = Future()
+                    self.ejecutados += 1
+                else:
+                    self.compartidos += 1
+
+            if lider:
+                break
+            try:
+                return futuro.result()
+            except _Interrumpido:
+                continue  # Quien lo ejecutaba se interrumpió: se vuelve a intentar
+
+        # La llave se libera antes de publicar el desenlace, para que quien reintente
+        # no vuelva a encontrar el mismo cálculo ya terminado
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            self._liberar(llave)
+            futuro.set_exception(e)
+            raise
+        except BaseException:
+            self._liberar(llave)
+            futuro.set_exception(_Interrumpido())
+            raise
+        self._liberar(llave)
+        futuro.set_result(resultado)
+        return resultado
+
+    def _liberar(self, llave):
+        with self._candado:
+            del self._en_curso[llave]